@@ -1,98 +1,253 @@
-from typing import Dict, Any, List, Optional
-from langchain_core.messages import HumanMessage, AIMessage
+from typing import Dict, Any, Awaitable, Callable, List, Optional
+from collections import deque
+from contextvars import ContextVar
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
 import os
-import traceback
-import importlib
+import functools
+import logging
+import uuid
+import asyncio
+import threading
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor
 
-# Try importing langsmith with a fallback
-try:
-    from langsmith import Client
-    LANGSMITH_AVAILABLE = True
-except ImportError:
-    LANGSMITH_AVAILABLE = False
-    
-from ..utils.config import LANGCHAIN_PROJECT, OPENWEATHER_API_KEY, OPENAI_API_KEY
+from ..utils.config import DEBUG, LANGCHAIN_API_KEY, LANGCHAIN_PROJECT, LANGCHAIN_SAMPLE_RATE, OPENWEATHER_API_KEY
 from ..utils.weather_api import get_weather
-from ..utils.document_processor import DocumentProcessor
+from ..utils.rate_limiter import AsyncRateLimiter
+from ..utils.document_processor import DocumentProcessor, get_embeddings
 from ..models.llm import create_rag_chain, create_weather_chain
-from .decision_agent import create_agent_graph, AgentState
+from .decision_agent import create_agent_graph, AgentState, guess_city, is_weather_query, reset_decision_llm
 
-# Check if we need mockups (for API problems)
-USE_MOCKUPS = OPENAI_API_KEY == "" or "insufficient_quota" in os.environ.get("OPENAI_ERROR", "")
+logger = logging.getLogger(__name__)
 
-if USE_MOCKUPS:
-    try:
-        from ..utils.mockups import create_mock_rag_chain, get_mock_weather, MockRetriever
-        MOCKUPS_AVAILABLE = True
-    except ImportError:
-        MOCKUPS_AVAILABLE = False
-else:
+# Mockups stand in for the OpenAI-backed components when the API is unusable
+try:
+    from ..utils.mockups import create_mock_rag_chain, get_mock_weather, MockRetriever
+    MOCKUPS_AVAILABLE = True
+except ImportError:
     MOCKUPS_AVAILABLE = False
 
+@functools.lru_cache(maxsize=1)
+def _use_mockups() -> bool:
+    """Check whether we need mockups (for API problems); cached until Agent.refresh_mode()."""
+    if not MOCKUPS_AVAILABLE:
+        return False
+    return not os.environ.get("OPENAI_API_KEY") or "insufficient_quota" in os.environ.get("OPENAI_ERROR", "")
+
+# Number of most recent messages kept in the conversation window
+CONVERSATION_WINDOW = 20
+
+# Process-wide document processor shared by all agents
+_DOC_PROC_SINGLETON: Optional[DocumentProcessor] = None
+_DOC_PROC_LOCK = threading.Lock()
+
+def _get_doc_processor() -> DocumentProcessor:
+    """Get the shared document processor, creating it on first use."""
+    global _DOC_PROC_SINGLETON
+    
+    if _DOC_PROC_SINGLETON is None:
+        with _DOC_PROC_LOCK:
+            if _DOC_PROC_SINGLETON is None:
+                _DOC_PROC_SINGLETON = DocumentProcessor()
+    
+    return _DOC_PROC_SINGLETON
+
+# Threads running speculative weather lookups
+_SPECULATION_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="weather-prefetch")
+
+# Documents retrieved speculatively for the document query running in the current context
+_PREFETCHED_DOCS: ContextVar[Optional[tuple]] = ContextVar("prefetched_docs", default=None)
+
+class _PrefetchRetriever(BaseRetriever):
+    """Mutable retriever proxy for the RAG chain.
+    
+    Delegates to `inner`, which is swapped when the vector store changes, and serves
+    speculatively prefetched documents when they match the query.
+    """
+    
+    inner: Any = None
+    
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List:
+        prefetched = _PREFETCHED_DOCS.get()
+        if prefetched is not None and prefetched[0] == query:
+            return prefetched[1]
+        return self.inner.get_relevant_documents(query)
+    
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> List:
+        prefetched = _PREFETCHED_DOCS.get()
+        if prefetched is not None and prefetched[0] == query:
+            return prefetched[1]
+        return await self.inner.aget_relevant_documents(query)
+
+# LangSmith is imported and its client created lazily on the first sampled query
+_LANGSMITH_CLIENT = None
+_LANGSMITH_LOADED = False
+
+def _get_client():
+    """Get the shared LangSmith client, or None if tracing is off or langsmith is unavailable."""
+    global _LANGSMITH_CLIENT, _LANGSMITH_LOADED
+    
+    if not _LANGSMITH_LOADED:
+        _LANGSMITH_LOADED = True
+        # Without an API key every trace upload fails and is retried in the background
+        if not LANGCHAIN_API_KEY or LANGCHAIN_SAMPLE_RATE <= 0:
+            return None
+        try:
+            from langsmith import Client
+            _LANGSMITH_CLIENT = Client()
+        except ImportError:
+            pass
+        except Exception as e:
+            logger.warning(f"Could not create LangSmith client: {e}")
+    
+    return _LANGSMITH_CLIENT
+
+def should_trace(trace_id: uuid.UUID) -> bool:
+    """Decide whether to trace a request based on its trace id and the sample rate."""
+    if not LANGCHAIN_PROJECT:
+        return False
+    
+    # Ratio-based sampling on the low 64 bits of the trace id
+    if (trace_id.int & 0xFFFFFFFFFFFFFFFF) >= LANGCHAIN_SAMPLE_RATE * 2**64:
+        return False
+    
+    return _get_client() is not None
+
+def _query_trace():
+    """Get a context tracing the graph run under it, or a no-op one if tracing is off."""
+    if _get_client() is None:
+        return nullcontext()
+    return _sampled_trace()
+
+@contextmanager
+def _sampled_trace():
+    """Trace the graph run under this context to LangSmith if the query is sampled."""
+    from langsmith.run_helpers import trace, tracing_context
+    
+    # Explicitly disable tracing for unsampled queries, even when enabled via environment
+    sampled = should_trace(uuid.uuid4())
+    with tracing_context(project_name=LANGCHAIN_PROJECT, enabled=sampled):
+        if sampled:
+            with trace(name="Agent Query", project_name=LANGCHAIN_PROJECT, client=_get_client()):
+                yield
+        else:
+            yield
+
 class Agent:
     """Main agent that coordinates the LangGraph workflow."""
     
     def __init__(self):
         """Initialize the agent components."""
+        self.doc_processor = None
+        self._doc_retriever = _PrefetchRetriever()
+        self._doc_rag_chain = None
+        self._mock_rag_chain = None
+        self._init_document_components()
+        
+        # Create the weather chain
+        self.weather_chain = create_weather_chain()
+        
+        # Create the agent graph once with our custom implementations
+        self.graph = create_agent_graph(
+            process_weather_fn=self.process_weather,
+            process_document_fn=self.process_document,
+            generate_response_fn=self.generate_response,
+            aprocess_document_fn=self.aprocess_document,
+            aprefetch_docs_fn=self.aprefetch_docs,
+            speculate_fn=self.speculate_weather
+        )
+        
+        # Initialize conversation history as a bounded sliding window
+        self.conversation_history = deque(maxlen=CONVERSATION_WINDOW)
+        
+        # Optional hook that summarizes messages about to leave the window
+        self.summarize_history: Optional[Callable[[List[BaseMessage]], str]] = None
+    
+    def _init_document_components(self):
+        """Set up the vector store, retriever and RAG chain, or their mockups."""
+        self._doc_retriever.inner = None
         try:
-            # Initialize the document processor
-            self.doc_processor = DocumentProcessor()
+            # Get the shared document processor
+            self.doc_processor = _get_doc_processor()
             
             # Use mockups if needed
-            if USE_MOCKUPS and MOCKUPS_AVAILABLE:
-                print("Using mockups due to API limitations")
+            if _use_mockups():
+                logger.info("Using mockups due to API limitations")
                 self.vector_store = None
-                self.retriever = MockRetriever()
-                self.rag_chain = create_mock_rag_chain()
+                self._attach_mock_retriever()
             else:
                 # Get the vector store
                 self.vector_store = self.doc_processor.get_vector_store()
                 
-                # Create the retriever
-                self.retriever = self.vector_store.as_retriever(
-                    search_type="similarity",
-                    search_kwargs={"k": 3}
-                )
-                
-                # Create the RAG chain
-                self.rag_chain = create_rag_chain(self.retriever)
+                # Get the cached retriever and the RAG chain
+                self._attach_document_retriever()
                 
         except Exception as e:
-            print(f"Warning: Failed to initialize vector store: {e}. Will initialize on first document upload.")
+            logger.warning(f"Failed to initialize vector store: {e}. Will initialize on first document upload.")
             self.vector_store = None
             self.retriever = None
             self.rag_chain = None
             
             # Try using mockups as fallback
-            if MOCKUPS_AVAILABLE:
-                print("Using mockups as fallback")
-                from ..utils.mockups import create_mock_rag_chain, MockRetriever
-                self.retriever = MockRetriever()
-                self.rag_chain = create_mock_rag_chain()
+            if _use_mockups():
+                logger.info("Using mockups as fallback")
+                self._attach_mock_retriever()
+    
+    def _attach_document_retriever(self):
+        """Point the RAG chain at the current vector store retriever, building the chain only once."""
+        self.retriever = self.doc_processor.get_retriever()
+        self._doc_retriever.inner = self.retriever
         
-        # Create the weather chain
-        self.weather_chain = create_weather_chain()
+        if self._doc_rag_chain is None:
+            self._doc_rag_chain = create_rag_chain(self._doc_retriever)
+        self.rag_chain = self._doc_rag_chain
+    
+    def _attach_mock_retriever(self):
+        """Use the mock retriever and RAG chain, building the chain only once."""
+        self.retriever = MockRetriever()
+        
+        if self._mock_rag_chain is None:
+            self._mock_rag_chain = create_mock_rag_chain()
+        self.rag_chain = self._mock_rag_chain
+    
+    def refresh_mode(self) -> bool:
+        """
+        Re-check whether mockups are needed, e.g. after the API key or quota changed.
         
-        # Create the agent graph
-        self.graph = create_agent_graph()
+        The embedding model, decision LLM and graph are rebuilt so they use the current API key.
         
-        # Initialize conversation history
-        self.conversation_history = []
+        Returns:
+            True if the agent now uses mockups, False otherwise
+        """
+        _use_mockups.cache_clear()
+        get_embeddings.cache_clear()
+        reset_decision_llm()
+        
+        if self.doc_processor is not None:
+            self.doc_processor.set_embeddings(get_embeddings())
+        self._init_document_components()
+        self.update_graph()
+        
+        return _use_mockups()
         
     def process_weather(self, state: AgentState) -> AgentState:
         """Process weather request using actual weather API."""
-        city = state["weather_city"]
-        query = state["query"]
+        city = state.weather_city
+        query = state.query
         
         if not city:
-            state["weather_result"] = "I need a city name to provide weather information."
+            state.weather_result = "I need a city name to provide weather information."
             return state
         
         try:
-            # Get the weather data - use mockup if needed
-            if USE_MOCKUPS and MOCKUPS_AVAILABLE:
-                from ..utils.mockups import get_mock_weather
+            # Get the weather data - use mockup if needed, or the speculative lookup for this city
+            prefetched = state.prefetched_weather
+            if _use_mockups():
                 weather_data = get_mock_weather(city)
+            elif prefetched is not None and prefetched[0].lower() == city.lower():
+                weather_data = prefetched[1].result()
             else:
                 weather_data = get_weather(city, OPENWEATHER_API_KEY)
             
@@ -102,45 +257,123 @@ class Agent:
                 "query": query
             })
             
-            state["weather_result"] = response
+            state.weather_result = response
         except Exception as e:
-            state["weather_result"] = f"I couldn't get weather information for {city}. Error: {str(e)}"
+            state.weather_result = f"I couldn't get weather information for {city}. Error: {str(e)}"
         
         return state
     
     def process_document(self, state: AgentState) -> AgentState:
         """Process document search using RAG."""
-        query = state["query"]
+        query = state.query
         
         if self.rag_chain is None:
-            state["document_result"] = "No documents have been uploaded yet. Please upload a document first."
+            state.document_result = "No documents have been uploaded yet. Please upload a document first."
             return state
         
         # Get response from the RAG chain
         try:
-            # Debug: Check what documents are retrieved
-            retrieved_docs = self.retriever.get_relevant_documents(query)
-            print(f"Retrieved {len(retrieved_docs)} documents")
-            for i, doc in enumerate(retrieved_docs):
-                print(f"Document {i+1}: {doc.page_content[:100]}...")
+            if DEBUG:
+                self._debug_retrieval(query)
             
             # Use the RAG chain
             response = self.rag_chain.invoke(query)
-            state["document_result"] = response
+            state.document_result = response
+        except Exception as e:
+            error_message = f"Error processing document query: {str(e)}"
+            logger.error(error_message, exc_info=True)
+            state.document_result = error_message
+        
+        return state
+    
+    async def aprocess_document(self, state: AgentState) -> AgentState:
+        """Process document search using RAG without blocking the event loop."""
+        query = state.query
+        
+        if self.rag_chain is None:
+            state.document_result = "No documents have been uploaded yet. Please upload a document first."
+            return state
+        
+        # Get response from the RAG chain
+        try:
+            if DEBUG:
+                self._debug_retrieval(query)
+            
+            # Use the RAG chain, serving it any prefetched documents
+            token = None
+            if isinstance(state.prefetched_docs, list):
+                token = _PREFETCHED_DOCS.set((query, state.prefetched_docs))
+            try:
+                response = await self.rag_chain.ainvoke(query)
+            finally:
+                if token is not None:
+                    _PREFETCHED_DOCS.reset(token)
+            state.document_result = response
         except Exception as e:
             error_message = f"Error processing document query: {str(e)}"
-            print(error_message)
-            print(traceback.format_exc())
-            state["document_result"] = error_message
+            logger.error(error_message, exc_info=True)
+            state.document_result = error_message
         
         return state
     
+    async def aprefetch_docs(self, state: AgentState) -> AgentState:
+        """Await the speculative retrieval started for a document query."""
+        if isinstance(state.prefetched_docs, asyncio.Task):
+            try:
+                state.prefetched_docs = await state.prefetched_docs
+            except Exception as e:
+                logger.warning(f"Speculative retrieval failed: {e}")
+                state.prefetched_docs = None
+        
+        return state
+    
+    def speculate_weather(self, state: AgentState):
+        """Start a weather lookup for a query that looks like a weather question."""
+        if _use_mockups() or not is_weather_query(state.query):
+            return
+        
+        # process_weather waits for this lookup instead of making its own if the decided city matches
+        city = guess_city(state.query)
+        if city:
+            state.prefetched_weather = (
+                city,
+                _SPECULATION_EXECUTOR.submit(get_weather, city, OPENWEATHER_API_KEY)
+            )
+    
+    def _start_speculation(self, state: AgentState):
+        """Start document retrieval before the decision is made."""
+        # Retrieval only depends on the query, so it can overlap the decision LLM call
+        if self.rag_chain is not None and self._doc_retriever.inner is not None:
+            state.prefetched_docs = asyncio.create_task(
+                self._doc_retriever.inner.aget_relevant_documents(state.query)
+            )
+    
+    @staticmethod
+    def _discard_speculation(state: AgentState):
+        """Cancel or reap a speculative retrieval that the graph did not use."""
+        task = state.prefetched_docs
+        if isinstance(task, asyncio.Task):
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()
+    
+    def _debug_retrieval(self, query: str):
+        """Log the documents retrieved for a query."""
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+        
+        retrieved_docs = self.retriever.get_relevant_documents(query)
+        logger.debug("Retrieved %d documents", len(retrieved_docs))
+        for i, doc in enumerate(retrieved_docs):
+            logger.debug("Document %d: %s...", i + 1, doc.page_content[:100])
+    
     def generate_response(self, state: AgentState) -> AgentState:
         """Generate final response based on processing results."""
-        if state["decision"] == "weather":
-            state["final_response"] = state["weather_result"]
+        if state.decision == "weather":
+            state.final_response = state.weather_result
         else:
-            state["final_response"] = state["document_result"]
+            state.final_response = state.document_result
         
         return state
     
@@ -152,50 +385,86 @@ class Agent:
             self.graph = create_agent_graph(
                 process_weather_fn=self.process_weather,
                 process_document_fn=self.process_document,
-                generate_response_fn=self.generate_response
+                generate_response_fn=self.generate_response,
+                aprocess_document_fn=self.aprocess_document,
+                aprefetch_docs_fn=self.aprefetch_docs,
+                speculate_fn=self.speculate_weather
             )
         except Exception as e:
-            print(f"Warning: Could not update graph: {e}")
-            print(traceback.format_exc())
+            logger.warning(f"Could not update graph: {e}", exc_info=True)
+
+    def _append_history(self, message: BaseMessage):
+        """Append a message, folding the oldest half into a summary when the window is full."""
+        history = self.conversation_history
+        if self.summarize_history is not None and len(history) == history.maxlen:
+            older = [history.popleft() for _ in range(history.maxlen // 2)]
+            history.appendleft(SystemMessage(content=self.summarize_history(older)))
+        
+        history.append(message)
+    
+    def _start_query(self, user_input: str, record_history: bool = True) -> AgentState:
+        """Record the user message and build the initial graph state."""
+        # Debug logs
+        logger.debug("Vector store initialized: %s", self.vector_store is not None)
+        logger.debug("Retriever initialized: %s", self.retriever is not None)
+        logger.debug("RAG chain initialized: %s", self.rag_chain is not None)
+        
+        # Add the user message to conversation history, or only to this query's snapshot of it
+        user_message = HumanMessage(content=user_input)
+        if record_history:
+            self._append_history(user_message)
+            messages = list(self.conversation_history)
+        else:
+            messages = list(self.conversation_history) + [user_message]
+        
+        # Create the initial state
+        return AgentState(
+            messages=messages,
+            query=user_input,
+            decision="",
+            weather_city="",
+            weather_result="",
+            document_result="",
+            final_response=""
+        )
+    
+    def _fallback_response(self, user_input: str) -> str:
+        """Answer a query with simple heuristics when graph processing fails."""
+        # Simple decision logic
+        if is_weather_query(user_input):
+            # Extract city name using a simple heuristic
+            city = guess_city(user_input) or "Unknown location"
+            
+            try:
+                # Use mockup if needed
+                if _use_mockups():
+                    weather_data = get_mock_weather(city)
+                else:
+                    weather_data = get_weather(city, OPENWEATHER_API_KEY)
+                return f"Weather information for {city}:\n\n{weather_data}"
+            except Exception as weather_e:
+                return f"I couldn't get weather information for {city}. Error: {str(weather_e)}"
+        
+        # Document query
+        if self.rag_chain is None:
+            return "No documents have been uploaded yet. Please upload a document first."
+        
+        try:
+            return self.rag_chain.invoke(user_input)
+        except Exception as doc_e:
+            return f"Error processing document query: {str(doc_e)}"
 
     def query(self, user_input: str) -> str:
         """Process a user query through the agent."""
         try:
-            # Debug logs
-            print(f"Vector store initialized: {self.vector_store is not None}")
-            print(f"Retriever initialized: {self.retriever is not None}")
-            print(f"RAG chain initialized: {self.rag_chain is not None}")
-            
-            # Try to update the graph
-            self.update_graph()
-            
-            # Add the user message to conversation history
-            self.conversation_history.append(HumanMessage(content=user_input))
-            
-            # Create the initial state
-            initial_state = AgentState(
-                messages=self.conversation_history.copy(),
-                query=user_input,
-                decision="",
-                weather_city="",
-                weather_result="",
-                document_result="",
-                final_response=""
-            )
+            initial_state = self._start_query(user_input)
             
-            # Run the graph with LangSmith tracing if available
+            # Run the graph with LangSmith tracing if available and sampled
             try:
-                if LANGSMITH_AVAILABLE and LANGCHAIN_PROJECT:
-                    with Client().trace(
-                        project_name=LANGCHAIN_PROJECT,
-                        name="Agent Query"
-                    ) as tracer:
-                        result = self.graph.invoke(initial_state)
-                else:
+                with _query_trace():
                     result = self.graph.invoke(initial_state)
             except Exception as e:
-                print(f"Graph invocation error: {e}")
-                print(traceback.format_exc())
+                logger.error(f"Graph invocation error: {e}", exc_info=True)
                 # If LangSmith tracing fails, run without it
                 result = self.graph.invoke(initial_state)
             
@@ -204,127 +473,179 @@ class Agent:
             
         except Exception as e:
             # If graph processing fails, fall back to a simpler implementation
-            print(f"Graph processing failed: {e}")
-            print(traceback.format_exc())
-            
-            # Simple decision logic
-            if "weather" in user_input.lower() or "temperature" in user_input.lower() or "forecast" in user_input.lower():
-                # Extract city name using a simple heuristic
-                import re
-                city_match = re.search(r"in\s+([A-Za-z\s]+)(?:\?|$)", user_input)
-                city = city_match.group(1).strip() if city_match else "Unknown location"
-                
-                try:
-                    # Use mockup if needed
-                    if USE_MOCKUPS and MOCKUPS_AVAILABLE:
-                        from ..utils.mockups import get_mock_weather
-                        weather_data = get_mock_weather(city)
-                    else:
-                        weather_data = get_weather(city, OPENWEATHER_API_KEY)
-                    response = f"Weather information for {city}:\n\n{weather_data}"
-                except Exception as weather_e:
-                    response = f"I couldn't get weather information for {city}. Error: {str(weather_e)}"
-            else:
-                # Document query
-                if self.rag_chain is None:
-                    response = "No documents have been uploaded yet. Please upload a document first."
-                else:
-                    try:
-                        response = self.rag_chain.invoke(user_input)
-                    except Exception as doc_e:
-                        response = f"Error processing document query: {str(doc_e)}"
+            logger.error(f"Graph processing failed: {e}", exc_info=True)
+            response = self._fallback_response(user_input)
         
         # Add the AI message to conversation history
-        self.conversation_history.append(AIMessage(content=response))
+        self._append_history(AIMessage(content=response))
         
         return response
+    
+    async def aquery(self, user_input: str, record_history: bool = True) -> str:
+        """
+        Process a user query through the agent without blocking the event loop.
         
-    def add_document_text(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> bool:
-        """Add document text to the vector store."""
-        try:
-            if self.doc_processor is None:
-                self.doc_processor = DocumentProcessor()
+        Args:
+            user_input: The user's query
+            record_history: Whether to add the exchange to the shared conversation history
             
-            # Use mockups if needed
-            if USE_MOCKUPS and MOCKUPS_AVAILABLE:
-                from ..utils.mockups import MockRetriever, create_mock_rag_chain
-                self.retriever = MockRetriever()
-                self.rag_chain = create_mock_rag_chain()
-                return True
-                
-            # Process the text
-            self.vector_store = self.doc_processor.process_text(text, metadata)
+        Returns:
+            Response to the query
+        """
+        initial_state = None
+        try:
+            initial_state = self._start_query(user_input, record_history)
+            self._start_speculation(initial_state)
             
-            # Update retriever and RAG chain
-            self.retriever = self.vector_store.as_retriever(
-                search_type="similarity",
-                search_kwargs={"k": 3}
-            )
+            # Run the graph with LangSmith tracing if available and sampled
+            try:
+                with _query_trace():
+                    result = await self.graph.ainvoke(initial_state)
+            except Exception as e:
+                logger.error(f"Graph invocation error: {e}", exc_info=True)
+                # If LangSmith tracing fails, run without it
+                result = await self.graph.ainvoke(initial_state)
             
-            self.rag_chain = create_rag_chain(self.retriever)
+            # Get the final response
+            response = result["final_response"]
             
-            return True
         except Exception as e:
-            print(f"Error adding document text: {e}")
-            print(traceback.format_exc())
+            # If graph processing fails, fall back to a simpler implementation
+            logger.error(f"Graph processing failed: {e}", exc_info=True)
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(None, self._fallback_response, user_input)
+        finally:
+            if initial_state is not None:
+                self._discard_speculation(initial_state)
+        
+        # Add the AI message to conversation history
+        if record_history:
+            self._append_history(AIMessage(content=response))
+        
+        return response
+    
+    async def abatch(
+        self,
+        queries: List[str],
+        max_concurrency: int = 10,
+        rate_limit: Optional[int] = None
+    ) -> List[str]:
+        """
+        Process several independent queries concurrently.
+        
+        Each query sees the conversation history as it was when the batch started;
+        batch queries are not added to it, so concurrent queries cannot interleave.
+        
+        Args:
+            queries: The user queries
+            max_concurrency: Maximum number of queries in flight at once
+            rate_limit: Maximum queries started per minute, or None for no limit
             
-            # Use mockups as fallback
-            if MOCKUPS_AVAILABLE:
-                from ..utils.mockups import MockRetriever, create_mock_rag_chain
-                self.retriever = MockRetriever()
-                self.rag_chain = create_mock_rag_chain()
-                return True
-                
-            return False
+        Returns:
+            Responses in the same order as the queries
+        """
+        sem = asyncio.Semaphore(max_concurrency)
+        limiter = AsyncRateLimiter(rate_limit)
+        
+        async def _run(user_input: str) -> str:
+            async with sem:
+                await limiter.acquire()
+                return await self.aquery(user_input, record_history=False)
+        
+        return await asyncio.gather(*[_run(q) for q in queries])
+        
+    def add_document_text(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """Add document text to the vector store."""
+        return self._index_documents(lambda processor: processor.process_text(text, metadata))
+            
+    async def aadd_document_text(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """Add document text to the vector store, embedding its chunks concurrently."""
+        return await self._aindex_documents(lambda processor: processor.aprocess_text(text, metadata))
             
     def upload_pdf(self, pdf_path: str, file_name: str) -> bool:
         """Upload a PDF document to the vector store."""
-        try:
-            # Use mockups if needed
-            if USE_MOCKUPS and MOCKUPS_AVAILABLE:
-                from ..utils.mockups import MockRetriever, create_mock_rag_chain
-                self.retriever = MockRetriever()
-                self.rag_chain = create_mock_rag_chain()
-                return True
-                
-            if self.doc_processor is None:
-                self.doc_processor = DocumentProcessor()
-                
-            # Process and index the document
-            chunks = self.doc_processor.load_pdf(pdf_path)
+        return self.upload_pdfs([pdf_path])
             
-            # Store in vector store
-            self.vector_store = self.doc_processor.store_documents(chunks)
+    async def aupload_pdf(self, pdf_path: str, file_name: str) -> bool:
+        """Upload a PDF document to the vector store, embedding its chunks concurrently."""
+        return await self.aupload_pdfs([pdf_path])
             
-            # Update retriever and RAG chain
-            self.retriever = self.vector_store.as_retriever(
-                search_type="similarity",
-                search_kwargs={"k": 3}
-            )
+    def upload_pdfs(self, pdf_paths: List[str]) -> bool:
+        """Upload several PDF documents to the vector store in one bulk upload."""
+        return self._index_documents(lambda processor: processor.upload_pdfs(pdf_paths), pdf_paths)
             
-            self.rag_chain = create_rag_chain(self.retriever)
+    async def aupload_pdfs(self, pdf_paths: List[str]) -> bool:
+        """Upload several PDF documents to the vector store in one bulk upload, embedding concurrently."""
+        return await self._aindex_documents(lambda processor: processor.aupload_pdfs(pdf_paths), pdf_paths)
+    
+    def _index_documents(self, store: Callable[[DocumentProcessor], Any], temp_paths: List[str] = ()) -> bool:
+        """
+        Update the vector store with a document processor call and point the retriever at it.
+        
+        Args:
+            store: Called with the document processor; returns the updated vector store
+            temp_paths: Uploaded temp files to delete once they have been indexed
             
-            # Delete temp file if needed
-            if os.path.exists(pdf_path) and "temp" in pdf_path.lower():
-                try:
-                    os.unlink(pdf_path)
-                except:
-                    pass
-                
+        Returns:
+            True if the documents were indexed (or mockups are in use), False otherwise
+        """
+        try:
+            if self._use_mock_documents():
+                return True
+            self._documents_indexed(store(self.doc_processor), temp_paths)
             return True
         except Exception as e:
-            print(f"Error uploading PDF: {e}")
-            print(traceback.format_exc())
-            
-            # Use mockups as fallback
-            if MOCKUPS_AVAILABLE:
-                from ..utils.mockups import MockRetriever, create_mock_rag_chain
-                self.retriever = MockRetriever()
-                self.rag_chain = create_mock_rag_chain()
+            return self._indexing_failed(e)
+    
+    async def _aindex_documents(self, astore: Callable[[DocumentProcessor], Awaitable[Any]], temp_paths: List[str] = ()) -> bool:
+        """Async variant of _index_documents for a document processor coroutine."""
+        try:
+            if self._use_mock_documents():
                 return True
-                
-            return False
+            self._documents_indexed(await astore(self.doc_processor), temp_paths)
+            return True
+        except Exception as e:
+            return self._indexing_failed(e)
+    
+    def _use_mock_documents(self) -> bool:
+        """Attach the mock retriever if mockups are in use, otherwise make sure the document processor exists."""
+        if _use_mockups():
+            self._attach_mock_retriever()
+            return True
+        
+        if self.doc_processor is None:
+            self.doc_processor = _get_doc_processor()
+        return False
+    
+    def _documents_indexed(self, vector_store: Any, temp_paths: List[str]):
+        """Point the retriever at the updated vector store and delete indexed temp files."""
+        self.vector_store = vector_store
+        
+        # Update retriever; the RAG chain is reused
+        self._attach_document_retriever()
+        
+        self._remove_temp_files(temp_paths)
+    
+    def _indexing_failed(self, error: Exception) -> bool:
+        """Log a failed document upload and fall back to mockups if they are in use."""
+        logger.error(f"Error indexing documents: {error}", exc_info=True)
+        
+        # Use mockups as fallback
+        if _use_mockups():
+            self._attach_mock_retriever()
+            return True
+            
+        return False
+            
+    def _remove_temp_files(self, paths: List[str]):
+        """Delete uploaded temp files once they have been indexed."""
+        for path in paths:
+            if os.path.exists(path) and "temp" in path.lower():
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
             
     def clear_conversation(self):
         """Clear the conversation history."""
-        self.conversation_history = []
+        self.conversation_history.clear()
@@ -1,105 +1,344 @@
-from typing import Literal, TypedDict, Annotated, Dict, Any, Callable, Optional
+from typing import Literal, Annotated, Dict, Any, Awaitable, Callable, List, Optional, Tuple
+import os
+import re
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass, field
 from langchain_core.messages import BaseMessage, HumanMessage
 from langchain.pydantic_v1 import BaseModel, Field
 from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, START, END
-from ..utils.config import OPENAI_API_KEY
-
-# Define the states for our agent
-class AgentState(TypedDict):
-    messages: Annotated[list[BaseMessage], "Messages sent to the agent"]
-    query: Annotated[str, "The user's original query"]
-    decision: Annotated[str, "The decision on how to handle the query"]
-    weather_city: Annotated[str, "City name for weather query if applicable"]
-    weather_result: Annotated[str, "Result from the weather API if applicable"]
-    document_result: Annotated[str, "Result from document search if applicable"]
-    final_response: Annotated[str, "Final response to be sent back to the user"]
 
-# Define the decision function to decide between weather and document
-def create_decision_node():
-    """Create a decision node that determines whether to use weather API or document search."""
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", """
-        You are a decision-making assistant that determines how to handle user queries.
+logger = logging.getLogger(__name__)
+
+# Try importing the semantic cache dependencies with a fallback
+try:
+    import faiss
+    import numpy as np
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    SEMANTIC_CACHE_AVAILABLE = True
+except ImportError:
+    SEMANTIC_CACHE_AVAILABLE = False
+
+# Semantic cache settings for routing decisions
+DECISION_CACHE_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+DECISION_CACHE_DIM = 384
+DECISION_CACHE_THRESHOLD = 0.95
+DECISION_CACHE_MAX_ENTRIES = 1024
+
+# Cheap heuristics for weather questions and the city a query names ("... in <city>?")
+_WEATHER_KW = re.compile(r"\b(weather|temperature|forecast)\b", re.I)
+_CITY_RE = re.compile(r"in\s+([A-Za-z\s]+?)(?:\?|$)", re.I)
+
+# Define the states for our agent (slotted for fast attribute access)
+@dataclass(slots=True)
+class AgentState:
+    messages: Annotated[list[BaseMessage], "Messages sent to the agent"] = field(default_factory=list)
+    query: Annotated[str, "The user's original query"] = ""
+    decision: Annotated[str, "The decision on how to handle the query"] = ""
+    weather_city: Annotated[str, "City name for weather query if applicable"] = ""
+    weather_result: Annotated[str, "Result from the weather API if applicable"] = ""
+    document_result: Annotated[str, "Result from document search if applicable"] = ""
+    final_response: Annotated[str, "Final response to be sent back to the user"] = ""
+    prefetched_docs: Annotated[Any, "Speculatively retrieved documents, or the task retrieving them"] = None
+    prefetched_weather: Annotated[Any, "City and future of a speculative weather lookup"] = None
+
+class SemanticDecisionCache:
+    """Similarity cache mapping query embeddings to (decision, city) routing results."""
+    
+    def __init__(
+        self,
+        embeddings,
+        dim: int = DECISION_CACHE_DIM,
+        threshold: float = DECISION_CACHE_THRESHOLD,
+        max_entries: int = DECISION_CACHE_MAX_ENTRIES
+    ):
+        """
+        Initialize the cache.
         
-        Based on the user's input, decide whether:
-        1. The query is asking for weather information (choose "weather")
-        2. The query is asking for information from documents (choose "document")
+        Args:
+            embeddings: Embedding model used to embed incoming queries
+            dim: Dimensionality of the embeddings
+            threshold: Minimum cosine similarity for a cache hit
+            max_entries: Maximum number of cached decisions before eviction
+        """
+        self.embeddings = embeddings
+        self.dim = dim
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._index = faiss.IndexFlatIP(dim)
+        self._vectors: List[Any] = []
+        self._results: List[Tuple[str, str]] = []
+        self._last_used: List[int] = []
+        self._clock = 0
+        self._lock = threading.Lock()
+    
+    def embed(self, query: str):
+        """Embed a query and normalize it so inner product equals cosine similarity."""
+        vector = np.asarray(self.embeddings.embed_query(query), dtype="float32")
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def lookup(self, vector) -> Optional[Tuple[str, str]]:
+        """Return the cached result for the nearest query if it is similar enough."""
+        with self._lock:
+            if self._index.ntotal == 0:
+                return None
+            
+            scores, ids = self._index.search(np.asarray([vector]), 1)
+            position = int(ids[0][0])
+            if position < 0 or scores[0][0] < self.threshold:
+                return None
+            
+            self._clock += 1
+            self._last_used[position] = self._clock
+            return self._results[position]
+    
+    def add(self, vector, result: Tuple[str, str]):
+        """Add a query embedding and its routing result to the cache."""
+        with self._lock:
+            self._clock += 1
+            self._index.add(np.asarray([vector]))
+            self._vectors.append(vector)
+            self._results.append(result)
+            self._last_used.append(self._clock)
+            
+            if len(self._results) > self.max_entries:
+                self._evict()
+    
+    def _evict(self):
+        """Drop the least recently used quarter of entries and rebuild the index."""
+        keep = sorted(
+            range(len(self._results)),
+            key=lambda i: self._last_used[i],
+            reverse=True
+        )[:self.max_entries * 3 // 4]
+        keep.sort()
         
-        If it's a weather query, also extract the name of the city or location.
+        self._vectors = [self._vectors[i] for i in keep]
+        self._results = [self._results[i] for i in keep]
+        self._last_used = [self._last_used[i] for i in keep]
         
-        Respond in the following format:
-        Decision: [weather/document]
-        City: [city name if applicable, otherwise "none"]
-        Reasoning: [brief explanation of your decision]
-        """),
-        ("human", "{query}"),
-    ])
-    
-    llm = ChatOpenAI(
-        model="gpt-3.5-turbo",
-        temperature=0,
-        openai_api_key=OPENAI_API_KEY
-    )
+        self._index = faiss.IndexFlatIP(self.dim)
+        self._index.add(np.asarray(self._vectors))
+
+_DECISION_CACHE: Optional[SemanticDecisionCache] = None
+_DECISION_CACHE_FAILED = False
+
+def get_decision_cache() -> Optional[SemanticDecisionCache]:
+    """Get the shared decision cache, or None if it is unavailable."""
+    global _DECISION_CACHE, _DECISION_CACHE_FAILED
+    
+    if _DECISION_CACHE is None and SEMANTIC_CACHE_AVAILABLE and not _DECISION_CACHE_FAILED:
+        try:
+            embeddings = HuggingFaceEmbeddings(model_name=DECISION_CACHE_MODEL)
+            _DECISION_CACHE = SemanticDecisionCache(embeddings)
+        except Exception as e:
+            logger.warning(f"Could not initialize decision cache: {e}")
+            _DECISION_CACHE_FAILED = True
+    
+    return _DECISION_CACHE
+
+# Pattern for parsing the decision LLM's response
+_PARSE_RE = re.compile(r"Decision:\s*(?P<dec>\w+)(?:.*?City:\s*(?P<city>[^\n]+))?", re.I | re.S)
+
+# Prompt for the decision node
+DECISION_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """
+    You are a decision-making assistant that determines how to handle user queries.
+    
+    Based on the user's input, decide whether:
+    1. The query is asking for weather information (choose "weather")
+    2. The query is asking for information from documents (choose "document")
+    
+    If it's a weather query, also extract the name of the city or location.
+    
+    Respond in the following format:
+    Decision: [weather/document]
+    City: [city name if applicable, otherwise "none"]
+    Reasoning: [brief explanation of your decision]
+    """),
+    ("human", "{query}"),
+])
+
+_DECISION_LLM: Optional[ChatOpenAI] = None
+
+def get_decision_llm() -> ChatOpenAI:
+    """Get the shared LLM client used by decision nodes."""
+    global _DECISION_LLM
+    
+    if _DECISION_LLM is None:
+        _DECISION_LLM = ChatOpenAI(
+            model="gpt-3.5-turbo",
+            temperature=0,
+            openai_api_key=os.environ.get("OPENAI_API_KEY")
+        )
+    
+    return _DECISION_LLM
+
+def reset_decision_llm():
+    """Drop the shared decision LLM so decision nodes created next use the current API key."""
+    global _DECISION_LLM
+    _DECISION_LLM = None
+
+def parse_decision(response_text: str) -> Tuple[str, str]:
+    """Parse the decision and city name from the decision LLM's response."""
+    match = _PARSE_RE.search(response_text)
+    decision = "weather" if match and match["dec"].lower() == "weather" else "document"
+    
+    city = (match["city"] or "").strip() if match else ""
+    if city.lower() == "none":
+        city = ""
+    
+    return decision, city
+
+def is_weather_query(query: str) -> bool:
+    """Return whether a query mentions the weather, without asking the decision LLM."""
+    return _WEATHER_KW.search(query) is not None
+
+def guess_city(query: str) -> str:
+    """Return the city a query names with the "in <city>" heuristic, or ""."""
+    match = _CITY_RE.search(query)
+    return match.group(1).strip() if match else ""
+
+def lookup_decision(query: str) -> Tuple[Optional[Tuple[str, str]], Any]:
+    """
+    Look up the decision of a semantically identical earlier query.
+    
+    Args:
+        query: The user's query
+        
+    Returns:
+        Tuple of the cached (decision, city) or None, and the query vector to cache under.
+        A cached decision is only returned if its city matches the one named in the query.
+    """
+    cache = get_decision_cache()
+    if cache is None:
+        return None, None
+    
+    try:
+        vector = cache.embed(query)
+        cached = cache.lookup(vector)
+    except Exception as e:
+        logger.warning(f"Decision cache lookup failed: {e}")
+        return None, None
+    
+    # Queries differing only in the city embed almost identically, so only reuse
+    # a decision when its city is the one named in this query
+    if cached is not None:
+        query_city = guess_city(query).lower()
+        cached_city = cached[1].lower()
+        if query_city and query_city != cached_city:
+            cached = None
+        elif cached_city and cached_city not in query.lower():
+            cached = None
     
-    chain = prompt | llm
+    return cached, vector
+
+def apply_decision(state: AgentState, response_text: str, vector: Any = None) -> AgentState:
+    """Parse the LLM response into the state and cache it under the query vector."""
+    decision, city = parse_decision(response_text)
+    
+    if vector is not None:
+        get_decision_cache().add(vector, (decision, city))
+    
+    state.decision = decision
+    state.weather_city = city
+    return state
+
+# Define the decision function to decide between weather and document
+def create_decision_node():
+    """Create a decision node that determines whether to use weather API or document search."""
+    chain = DECISION_PROMPT | get_decision_llm()
     
     def decide(state: AgentState) -> AgentState:
-        query = state["query"]
-        response = chain.invoke({"query": query})
-        response_text = response.content
+        cached, vector = lookup_decision(state.query)
+        if cached is not None:
+            state.decision, state.weather_city = cached
+            return state
         
-        lines = response_text.strip().split("\n")
-        decision = "document"  # Default
-        city = "none"
+        response = chain.invoke({"query": state.query})
+        return apply_decision(state, response.content, vector)
+    
+    return decide
+
+def create_async_decision_node(speculate_fn: Optional[Callable[[AgentState], None]] = None):
+    """
+    Create an async decision node that awaits the LLM instead of blocking on it.
+    
+    Args:
+        speculate_fn: Called before waiting on the decision LLM to start a speculative
+            weather lookup in `prefetched_weather`, which is cancelled unless the
+            decision is "weather"
+        
+    Returns:
+        Async decision node
+    """
+    chain = DECISION_PROMPT | get_decision_llm()
+    
+    async def adecide(state: AgentState) -> AgentState:
+        # Embedding (and loading the model on first use) is blocking work
+        cached, vector = await asyncio.to_thread(lookup_decision, state.query)
+        if cached is not None:
+            state.decision, state.weather_city = cached
+            return state
+        
+        # Only speculate when there is an LLM call to overlap the lookup with
+        if speculate_fn is not None:
+            speculate_fn(state)
+        
+        response = await chain.ainvoke({"query": state.query})
+        state = apply_decision(state, response.content, vector)
         
-        for line in lines:
-            if line.startswith("Decision:"):
-                decision_value = line.split(":", 1)[1].strip().lower()
-                if decision_value == "weather":
-                    decision = "weather"
-            elif line.startswith("City:"):
-                city = line.split(":", 1)[1].strip()
-                if city.lower() == "none":
-                    city = ""
+        if state.prefetched_weather is not None and state.decision != "weather":
+            state.prefetched_weather[1].cancel()
+            state.prefetched_weather = None
         
-        state["decision"] = decision
-        state["weather_city"] = city
         return state
     
-    return decide
+    return adecide
 
 # Define the weather processing function
 def process_weather(state: AgentState) -> AgentState:
     """Process weather request in agent state."""
-    state["weather_result"] = f"Weather data for {state['weather_city']} will be fetched."
+    state.weather_result = f"Weather data for {state.weather_city} will be fetched."
     return state
 
 # Define the document processing function
 def process_document(state: AgentState) -> AgentState:
     """Process document search request in agent state."""
-    state["document_result"] = "Document search results will go here."
+    state.document_result = "Document search results will go here."
     return state
 
 # Define the response generation function
 def generate_response(state: AgentState) -> AgentState:
     """Generate the final response based on the results."""
-    if state["decision"] == "weather":
-        state["final_response"] = f"Weather Response: {state['weather_result']}"
+    if state.decision == "weather":
+        state.final_response = f"Weather Response: {state.weather_result}"
     else:
-        state["final_response"] = f"Document Response: {state['document_result']}"
+        state.final_response = f"Document Response: {state.document_result}"
+    return state
+
+# Define the prefetch function used when nothing was retrieved speculatively
+def skip_prefetch(state: AgentState) -> AgentState:
+    """Pass the state through unchanged; synchronous runs do not prefetch documents."""
     return state
 
 # Define the router function with the correct signature
 def router(state: AgentState) -> str:
     """Route to the appropriate node based on the decision state field."""
-    return state["decision"]
+    return state.decision
 
 def create_agent_graph(
     process_weather_fn: Optional[Callable[[AgentState], AgentState]] = None,
     process_document_fn: Optional[Callable[[AgentState], AgentState]] = None,
-    generate_response_fn: Optional[Callable[[AgentState], AgentState]] = None
+    generate_response_fn: Optional[Callable[[AgentState], AgentState]] = None,
+    aprocess_document_fn: Optional[Callable[[AgentState], Awaitable[AgentState]]] = None,
+    aprefetch_docs_fn: Optional[Callable[[AgentState], Awaitable[AgentState]]] = None,
+    speculate_fn: Optional[Callable[[AgentState], None]] = None
 ):
     """
     Create the LangGraph for the agent with optional custom implementations.
@@ -108,6 +347,11 @@ def create_agent_graph(
         process_weather_fn: Custom implementation for the weather processing node
         process_document_fn: Custom implementation for the document processing node
         generate_response_fn: Custom implementation for the response generation node
+        aprocess_document_fn: Async implementation of the document node used by ainvoke
+        aprefetch_docs_fn: Async node run before the document node to collect speculatively
+            retrieved documents
+        speculate_fn: Starts a speculative weather lookup while ainvoke waits on the
+            decision LLM
         
     Returns:
         Compiled StateGraph
@@ -120,11 +364,19 @@ def create_agent_graph(
     _process_document = process_document_fn or process_document
     _generate_response = generate_response_fn or generate_response
     
-    # Add nodes
-    workflow.add_node("decide", create_decision_node())
+    # Add nodes (the decision node supports both invoke and ainvoke)
+    workflow.add_node("decide", RunnableLambda(
+        create_decision_node(),
+        afunc=create_async_decision_node(speculate_fn)
+    ))
     workflow.add_node("weather", _process_weather)
-    workflow.add_node("document", _process_document)
+    if aprocess_document_fn is not None:
+        workflow.add_node("document", RunnableLambda(_process_document, afunc=aprocess_document_fn))
+    else:
+        workflow.add_node("document", _process_document)
     workflow.add_node("response", _generate_response)
+    if aprefetch_docs_fn is not None:
+        workflow.add_node("prefetch_docs", RunnableLambda(skip_prefetch, afunc=aprefetch_docs_fn))
     
     # Add edges
     workflow.add_edge(START, "decide")
@@ -135,10 +387,12 @@ def create_agent_graph(
         router,
         {
             "weather": "weather",
-            "document": "document"
+            "document": "prefetch_docs" if aprefetch_docs_fn is not None else "document"
         }
     )
     
+    if aprefetch_docs_fn is not None:
+        workflow.add_edge("prefetch_docs", "document")
     workflow.add_edge("weather", "response")
     workflow.add_edge("document", "response")
     workflow.add_edge("response", END)
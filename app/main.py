@@ -1,6 +1,7 @@
 import os
 import sys
 import traceback
+from typing import List, Optional
 
 # Fix import path issues for standalone execution
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -8,32 +9,8 @@ project_root = os.path.dirname(current_dir)
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-try:
-    from app.agents.agent import Agent
-except ImportError:
-    try:
-        # Try relative import for running within the app directory
-        from agents.agent import Agent
-    except ImportError as e:
-        print(f"Error importing Agent: {e}")
-        print(f"sys.path: {sys.path}")
-        
-        # Define a mock Agent class for fallback
-        class Agent:
-            def __init__(self):
-                self.conversation_history = []
-                
-            def query(self, text):
-                return f"Mock response to: {text}"
-                
-            def upload_pdf(self, path, name):
-                return True
-                
-            def add_document_text(self, text, metadata=None):
-                return True
-                
-            def clear_conversation(self):
-                self.conversation_history = []
+# Import failures should surface, not be masked by a stand-in agent
+from app.agents.agent import Agent
 
 
 class App:
@@ -66,6 +43,49 @@ class App:
             print(traceback.format_exc())
             return error_message
     
+    async def aprocess_query(self, query: str) -> str:
+        """
+        Process a user query asynchronously.
+        
+        Args:
+            query: The user's query
+            
+        Returns:
+            Response to the query
+        """
+        try:
+            return await self.agent.aquery(query)
+        except Exception as e:
+            error_message = f"Error processing query: {str(e)}"
+            print(error_message)
+            print(traceback.format_exc())
+            return error_message
+    
+    async def aprocess_queries(
+        self,
+        queries: List[str],
+        max_concurrency: int = 10,
+        rate_limit: Optional[int] = None
+    ) -> List[str]:
+        """
+        Process several user queries concurrently.
+        
+        Args:
+            queries: The user queries
+            max_concurrency: Maximum number of queries in flight at once
+            rate_limit: Maximum queries started per minute, or None for no limit
+            
+        Returns:
+            Responses in the same order as the queries
+        """
+        try:
+            return await self.agent.abatch(queries, max_concurrency=max_concurrency, rate_limit=rate_limit)
+        except Exception as e:
+            error_message = f"Error processing queries: {str(e)}"
+            print(error_message)
+            print(traceback.format_exc())
+            return [error_message] * len(queries)
+    
     def upload_pdf(self, pdf_path: str, file_name: str) -> bool:
         """
         Upload a PDF document.
@@ -84,6 +104,58 @@ class App:
             print(traceback.format_exc())
             return False
     
+    async def aupload_pdf(self, pdf_path: str, file_name: str) -> bool:
+        """
+        Upload a PDF document, embedding its chunks concurrently.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            file_name: Name of the file
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            return await self.agent.aupload_pdf(pdf_path, file_name)
+        except Exception as e:
+            print(f"Error uploading PDF: {e}")
+            print(traceback.format_exc())
+            return False
+    
+    def upload_pdfs(self, pdf_paths: List[str]) -> bool:
+        """
+        Upload several PDF documents in one batch.
+        
+        Args:
+            pdf_paths: Paths to the PDF files
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            return self.agent.upload_pdfs(pdf_paths)
+        except Exception as e:
+            print(f"Error uploading PDFs: {e}")
+            print(traceback.format_exc())
+            return False
+    
+    async def aupload_pdfs(self, pdf_paths: List[str]) -> bool:
+        """
+        Upload several PDF documents in one batch, embedding their chunks concurrently.
+        
+        Args:
+            pdf_paths: Paths to the PDF files
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            return await self.agent.aupload_pdfs(pdf_paths)
+        except Exception as e:
+            print(f"Error uploading PDFs: {e}")
+            print(traceback.format_exc())
+            return False
+    
     def add_text(self, text: str, source: str = "user_input") -> bool:
         """
         Add text directly to the document store.
@@ -102,6 +174,24 @@ class App:
             print(traceback.format_exc())
             return False
     
+    async def aadd_text(self, text: str, source: str = "user_input") -> bool:
+        """
+        Add text directly to the document store, embedding its chunks concurrently.
+        
+        Args:
+            text: Text content
+            source: Source of the text
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            return await self.agent.aadd_document_text(text, {"source": source})
+        except Exception as e:
+            print(f"Error adding text: {e}")
+            print(traceback.format_exc())
+            return False
+    
     def clear_conversation(self):
         """Clear the conversation history."""
         try:
@@ -0,0 +1,17 @@
+# app/tests/conftest.py
+import pytest
+from unittest.mock import MagicMock
+from ..utils.document_processor import DocumentProcessor
+
+@pytest.fixture(scope="session")
+def mock_doc_processor():
+    """DocumentProcessor with mocked embeddings, vector DB client and text splitter, shared by the session."""
+    processor = DocumentProcessor(embeddings=MagicMock(), client=MagicMock())
+    processor.text_splitter = MagicMock()
+    return processor
+
+@pytest.fixture
+def doc_processor(mock_doc_processor):
+    """The shared mock DocumentProcessor with its text splitter reset for each test."""
+    mock_doc_processor.text_splitter.reset_mock(return_value=True, side_effect=True)
+    return mock_doc_processor
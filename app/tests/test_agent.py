@@ -0,0 +1,101 @@
+# app/tests/test_agent.py
+import pytest
+import asyncio
+from collections import deque
+from unittest.mock import patch, MagicMock, AsyncMock
+from langchain_core.messages import HumanMessage, SystemMessage
+from ..agents.agent import Agent, CONVERSATION_WINDOW, _PrefetchRetriever, _PREFETCHED_DOCS
+from ..agents.decision_agent import AgentState
+
+@pytest.fixture
+def agent():
+    """Agent with only its conversation history set up, skipping the LLM and vector DB setup."""
+    agent = Agent.__new__(Agent)
+    agent.conversation_history = deque(maxlen=CONVERSATION_WINDOW)
+    agent.summarize_history = None
+    return agent
+
+def test_append_history_evicts_oldest(agent):
+    """Test that the history keeps only the latest CONVERSATION_WINDOW messages."""
+    for i in range(CONVERSATION_WINDOW + 5):
+        agent._append_history(HumanMessage(content=str(i)))
+    
+    assert len(agent.conversation_history) == CONVERSATION_WINDOW
+    assert [m.content for m in agent.conversation_history] == [str(i) for i in range(5, CONVERSATION_WINDOW + 5)]
+
+def test_append_history_summarizes_evicted(agent):
+    """Test that the summarize hook receives the evicted half of a full window."""
+    agent.summarize_history = MagicMock(return_value="summary")
+    for i in range(CONVERSATION_WINDOW):
+        agent._append_history(HumanMessage(content=str(i)))
+    agent.summarize_history.assert_not_called()
+    
+    agent._append_history(HumanMessage(content="new"))
+    
+    agent.summarize_history.assert_called_once()
+    evicted = agent.summarize_history.call_args[0][0]
+    assert [m.content for m in evicted] == [str(i) for i in range(CONVERSATION_WINDOW // 2)]
+    
+    history = list(agent.conversation_history)
+    assert isinstance(history[0], SystemMessage)
+    assert history[0].content == "summary"
+    assert [m.content for m in history[1:]] == [str(i) for i in range(CONVERSATION_WINDOW // 2, CONVERSATION_WINDOW)] + ["new"]
+
+def test_prefetch_retriever_serves_matching_docs():
+    """Test that prefetched documents are served only for the query they were retrieved for."""
+    inner = MagicMock()
+    retriever = _PrefetchRetriever(inner=inner)
+    
+    token = _PREFETCHED_DOCS.set(("query", ["prefetched"]))
+    try:
+        assert retriever._get_relevant_documents("query", run_manager=MagicMock()) == ["prefetched"]
+        inner.get_relevant_documents.assert_not_called()
+        
+        # A different query misses and is delegated to the wrapped retriever
+        assert retriever._get_relevant_documents("other", run_manager=MagicMock()) == inner.get_relevant_documents.return_value
+        inner.get_relevant_documents.assert_called_once_with("other")
+    finally:
+        _PREFETCHED_DOCS.reset(token)
+
+def test_aprocess_document_resets_prefetched_docs(agent):
+    """Test that prefetched documents do not leak into the next query."""
+    seen = []
+    
+    def answer(query):
+        seen.append(_PREFETCHED_DOCS.get())
+        return "answer"
+    
+    agent.rag_chain = MagicMock()
+    agent.rag_chain.ainvoke = AsyncMock(side_effect=answer)
+    
+    async def run_queries():
+        first = await agent.aprocess_document(AgentState(query="query", prefetched_docs=["prefetched"]))
+        await agent.aprocess_document(AgentState(query="query"))
+        return first
+    
+    assert asyncio.run(run_queries()).document_result == "answer"
+    assert seen == [("query", ["prefetched"]), None]
+
+def test_discard_speculation_cancels_pending_retrieval():
+    """Test that an unused speculative retrieval is cancelled."""
+    async def run():
+        state = AgentState(prefetched_docs=asyncio.create_task(asyncio.sleep(10)))
+        Agent._discard_speculation(state)
+        with pytest.raises(asyncio.CancelledError):
+            await state.prefetched_docs
+    
+    asyncio.run(run())
+
+@patch('app.agents.agent._SPECULATION_EXECUTOR')
+@patch('app.agents.agent._use_mockups', return_value=False)
+def test_speculate_weather_only_for_weather_queries(mock_use_mockups, mock_executor, agent):
+    """Test that the weather is only looked up speculatively for weather questions naming a city."""
+    for query in ["Summarize the report written in London", "What's the weather like?"]:
+        state = AgentState(query=query)
+        agent.speculate_weather(state)
+        assert state.prefetched_weather is None
+    mock_executor.submit.assert_not_called()
+    
+    state = AgentState(query="What's the weather in London?")
+    agent.speculate_weather(state)
+    assert state.prefetched_weather == ("London", mock_executor.submit.return_value)
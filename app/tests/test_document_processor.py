@@ -2,8 +2,9 @@
 import pytest
 import os
 import tempfile
-from unittest.mock import patch, MagicMock
-from ..utils.document_processor import DocumentProcessor
+import asyncio
+from unittest.mock import patch, MagicMock, AsyncMock
+from ..utils.document_processor import EMBED_BATCH_SIZE, EMBED_MAX_CONCURRENCY
 
 @pytest.fixture
 def sample_pdf_path():
@@ -18,16 +19,28 @@ def sample_pdf_path():
     if os.path.exists(temp_path):
         os.remove(temp_path)
 
-@patch('langchain_community.document_loaders.PyPDFLoader.load')
-def test_load_pdf(mock_load, sample_pdf_path):
+@pytest.fixture
+def qdrant_client(doc_processor):
+    """The shared processor's mock Qdrant client, reset for each test, with an indexing threshold of 50000."""
+    client = doc_processor.client
+    client.reset_mock(side_effect=True)
+    client.get_collection.return_value.config.optimizer_config.indexing_threshold = 50000
+    yield client
+    client.reset_mock(side_effect=True)
+
+def _indexing_thresholds(client):
+    """The indexing thresholds the collection was updated with, in order."""
+    return [c.kwargs["optimizer_config"].indexing_threshold for c in client.update_collection.call_args_list]
+
+@patch('app.utils.document_processor._read_pdf_pages')
+def test_load_pdf(mock_load, sample_pdf_path, doc_processor):
     """Test PDF loading."""
     # Configure the mock
     mock_documents = [MagicMock(page_content="Test content")]
     mock_load.return_value = mock_documents
     
-    # Create processor with mocked text_splitter
-    processor = DocumentProcessor()
-    processor.text_splitter = MagicMock()
+    # Use the shared processor with mocked text_splitter
+    processor = doc_processor
     processor.text_splitter.split_documents.return_value = ["chunk1", "chunk2"]
     
     # Call the function
@@ -35,23 +48,131 @@ def test_load_pdf(mock_load, sample_pdf_path):
     
     # Verify the result
     assert result == ["chunk1", "chunk2"]
-    mock_load.assert_called_once()
+    mock_load.assert_called_once_with(sample_pdf_path)
     processor.text_splitter.split_documents.assert_called_once_with(mock_documents)
 
-@patch('os.listdir')
-@patch('app.utils.document_processor.DocumentProcessor.load_pdf')
-def test_load_all_pdfs(mock_load_pdf, mock_listdir):
-    """Test loading all PDFs."""
+@patch('os.makedirs')
+@patch('app.utils.document_processor.LOAD_DOCUMENTS_NUM_WORKERS', 1)
+@patch('app.utils.document_processor._load_one')
+@patch('app.utils.document_processor._iter_document_files')
+def test_load_all_documents(mock_iter_files, mock_load_one, mock_makedirs, doc_processor):
+    """Test loading all documents from the data directories."""
     # Configure the mocks
-    mock_listdir.return_value = ["doc1.pdf", "doc2.pdf", "not_a_pdf.txt"]
-    mock_load_pdf.side_effect = [["chunk1", "chunk2"], ["chunk3"]]
+    mock_iter_files.return_value = iter([("doc1.pdf", "pdf"), ("doc2.pdf", "pdf"), ("notes.txt", "txt")])
+    mock_load_one.side_effect = [["chunk1", "chunk2"], ["chunk3"], ["chunk4"]]
     
-    # Create processor
-    processor = DocumentProcessor()
+    # Use the shared processor
+    processor = doc_processor
     
     # Call the function
-    result = processor.load_all_pdfs()
+    result = processor.load_all_documents()
+    
+    # Verify the result
+    assert result == ["chunk1", "chunk2", "chunk3", "chunk4"]
+    assert [c.args[0] for c in mock_load_one.call_args_list] == [
+        ("doc1.pdf", "pdf"), ("doc2.pdf", "pdf"), ("notes.txt", "txt")
+    ]
+
+@patch('app.utils.document_processor.LOAD_DOCUMENTS_NUM_WORKERS', 4)
+@patch('app.utils.document_processor.ProcessPoolExecutor')
+@patch('app.utils.document_processor._load_one')
+def test_load_pdfs_single_file_in_process(mock_load_one, mock_pool, doc_processor):
+    """Test a single PDF is loaded without starting worker processes."""
+    mock_load_one.return_value = ["chunk1"]
+    
+    assert doc_processor.load_pdfs(["doc1.pdf"]) == ["chunk1"]
+    mock_load_one.assert_called_once_with(("doc1.pdf", "pdf"))
+    mock_pool.assert_not_called()
+
+def test_aembed_texts_keeps_order(doc_processor):
+    """Test concurrent batch embedding returns vectors in input order."""
+    texts = [f"text{i}" for i in range(2500)]
+    aembed = AsyncMock(side_effect=lambda batch: [[float(t[4:])] for t in batch])
+    
+    with patch.object(doc_processor.embeddings, "aembed_documents", aembed):
+        vectors = asyncio.run(doc_processor._aembed_texts(texts))
+    
+    # Verify the result
+    assert vectors == [[float(i)] for i in range(2500)]
+    assert aembed.await_count == 3
+
+def test_aembed_texts_bounds_concurrency(doc_processor):
+    """Test no more than EMBED_MAX_CONCURRENCY embedding requests are in flight at once."""
+    in_flight = 0
+    peak = 0
+    
+    async def embed(batch):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0)
+        in_flight -= 1
+        return [[0.0] for _ in batch]
+    
+    texts = ["text"] * (EMBED_BATCH_SIZE * (EMBED_MAX_CONCURRENCY + 2))
+    with patch.object(doc_processor.embeddings, "aembed_documents", AsyncMock(side_effect=embed)):
+        asyncio.run(doc_processor._aembed_texts(texts))
+    
+    # Verify the result
+    assert peak == EMBED_MAX_CONCURRENCY
+
+def test_embed_texts_sorts_by_length(doc_processor):
+    """Test embedding batches are length-sorted and vectors come back in input order."""
+    texts = ["a" * n for n in (5, 1, 3)]
+    embed = MagicMock(side_effect=lambda batch: [[float(len(t))] for t in batch])
+    
+    with patch.object(doc_processor.embeddings, "embed_documents", embed):
+        vectors = doc_processor._embed_texts(texts)
+    
+    # Verify the result
+    assert vectors == [[5.0], [1.0], [3.0]]
+    embed.assert_called_once_with(["a", "aaa", "aaaaa"])
+
+def test_bulk_indexing_restores_prior_threshold(doc_processor, qdrant_client):
+    """Test indexing is paused during a bulk upload and the collection's own threshold restored."""
+    with doc_processor._bulk_indexing():
+        assert _indexing_thresholds(qdrant_client) == [0]
+    
+    # Verify the result
+    assert _indexing_thresholds(qdrant_client) == [0, 50000]
+
+def test_bulk_indexing_overlapping_uploads(doc_processor, qdrant_client):
+    """Test overlapping bulk uploads only restore indexing after the last one finishes."""
+    async def upload(started, release):
+        async with doc_processor._abulk_indexing():
+            started.set()
+            await release.wait()
+    
+    async def run():
+        first_started, second_started, release_first, release_second = (asyncio.Event() for _ in range(4))
+        first = asyncio.create_task(upload(first_started, release_first))
+        await first_started.wait()
+        second = asyncio.create_task(upload(second_started, release_second))
+        await second_started.wait()
+        
+        # The first upload finishing must not re-enable indexing under the second
+        release_first.set()
+        await first
+        assert _indexing_thresholds(qdrant_client) == [0]
+        
+        release_second.set()
+        await second
+    
+    asyncio.run(run())
+    
+    # Verify the result
+    assert _indexing_thresholds(qdrant_client) == [0, 50000]
+    qdrant_client.get_collection.assert_called_once()
+
+def test_upload_chunks_falls_back_to_upsert(doc_processor, qdrant_client):
+    """Test chunks are upserted when the parallel collection upload fails."""
+    qdrant_client.upload_collection.side_effect = RuntimeError("upload failed")
+    chunks = [MagicMock(page_content="chunk1", metadata={"source": "doc1.pdf"})]
+    
+    doc_processor._upload_chunks(chunks, [[0.5, 0.5]])
     
     # Verify the result
-    assert result == ["chunk1", "chunk2", "chunk3"]
-    assert mock_load_pdf.call_count == 2
\ No newline at end of file
+    qdrant_client.upsert.assert_called_once()
+    points = qdrant_client.upsert.call_args.kwargs["points"]
+    assert [point.vector for point in points] == [[0.5, 0.5]]
+    assert [point.payload for point in points] == [{"page_content": "chunk1", "metadata": {"source": "doc1.pdf"}}]
@@ -1,7 +1,7 @@
 # app/tests/test_weather_api.py
 import pytest
 from unittest.mock import patch, MagicMock
-from ..utils.weather_api import WeatherAPI, get_weather
+from ..utils.weather_api import WeatherAPI, get_weather, clear_weather_cache
 
 @pytest.fixture
 def mock_weather_data():
@@ -29,7 +29,13 @@ def test_format_weather_data(mock_weather_data):
     assert "76%" in formatted
     assert "5.1 m/s" in formatted
 
-@patch('requests.get')
+@pytest.fixture(autouse=True)
+def empty_weather_cache():
+    clear_weather_cache()
+    yield
+    clear_weather_cache()
+
+@patch('app.utils.weather_api.WeatherAPI._session.get')
 def test_get_weather_by_city(mock_get, mock_weather_data):
     """Test weather API call."""
     # Configure the mock
@@ -39,12 +45,29 @@ def test_get_weather_by_city(mock_get, mock_weather_data):
     mock_get.return_value = mock_response
     
     # Call the function
-    result = WeatherAPI.get_weather_by_city("London")
+    result = WeatherAPI.get_weather_by_city("London", "test_key")
     
     # Verify the result
     assert result == mock_weather_data
     mock_get.assert_called_once()
     assert "London" in mock_get.call_args[1]["params"]["q"]
+    
+    # A repeated lookup is served from the cache
+    assert WeatherAPI.get_weather_by_city("London", "test_key") == mock_weather_data
+    assert WeatherAPI.get_weather_by_city("london ", "test_key") == mock_weather_data
+    mock_get.assert_called_once()
+
+@patch('app.utils.weather_api.WeatherAPI._session.get')
+def test_weather_cache_key(mock_get, mock_weather_data):
+    """Test the weather cache ignores city case and whitespace but not units."""
+    mock_get.return_value.json.return_value = mock_weather_data
+    
+    WeatherAPI.get_weather_by_city("Paris", "test_key")
+    WeatherAPI.get_weather_by_city(" PARIS", "test_key")
+    assert mock_get.call_count == 1
+    
+    WeatherAPI.get_weather_by_city("paris", "test_key", units="imperial")
+    assert mock_get.call_count == 2
 
 @patch('app.utils.weather_api.WeatherAPI.get_weather_by_city')
 def test_get_weather(mock_get_weather, mock_weather_data):
@@ -53,12 +76,12 @@ def test_get_weather(mock_get_weather, mock_weather_data):
     mock_get_weather.return_value = mock_weather_data
     
     # Call the function
-    result = get_weather("London")
+    result = get_weather("London", "test_key")
     
     # Verify the result
     assert "London" in result
     assert "15.2°C" in result
-    mock_get_weather.assert_called_once_with("London")
+    mock_get_weather.assert_called_once_with("London", "test_key")
 
 @patch('app.utils.weather_api.WeatherAPI.get_weather_by_city')
 def test_get_weather_error(mock_get_weather):
@@ -67,7 +90,7 @@ def test_get_weather_error(mock_get_weather):
     mock_get_weather.side_effect = Exception("API error")
     
     # Call the function
-    result = get_weather("NonexistentCity")
+    result = get_weather("NonexistentCity", "test_key")
     
     # Verify the result contains an error message
     assert "Error" in result
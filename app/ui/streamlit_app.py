@@ -1,5 +1,8 @@
 import streamlit as st
+import asyncio
+import shutil
 import tempfile
+import threading
 import os
 import sys
 import traceback
@@ -10,57 +13,35 @@ st.set_page_config(
         layout="wide"
     )
 
-# Fix import path issues
-current_dir = os.path.dirname(os.path.abspath(__file__))
-parent_dir = os.path.dirname(current_dir)  # app directory
-project_root = os.path.dirname(parent_dir)  # project root
-
-# Add paths to sys.path if not already there
-if parent_dir not in sys.path:
-    sys.path.insert(0, parent_dir)
+# Make the project root importable; Streamlit reruns this module, so only add it once
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-# Now try to import using absolute imports
-try:
-    # Try different import options
-    from app.main import get_app
-except ImportError as e1:
-    try:
-        # Try a different approach with project root on path
-        sys.path.insert(0, project_root)
-        from app.main import get_app
-    except ImportError as e2:
-        try:
-            # Try direct import 
-            import sys
-            sys.path.append(os.path.join(os.path.dirname(__file__), "../.."))
-            from app.main import get_app
-        except ImportError as e3:
-            st.error(f"Error importing app: {str(e3)}")
-            st.error(f"Current paths in sys.path: {sys.path}")
-            
-            # Create a simple mock app as fallback
-            class MockApp:
-                def process_query(self, query):
-                    return f"Mock response to: {query}"
-                
-                def upload_pdf(self, *args, **kwargs):
-                    return True
-                    
-                def clear_conversation(self):
-                    pass
-                
-                def add_text(self, text, source="user_input"):
-                    return True
-            
-            def get_app():
-                return MockApp()
+from app.main import get_app
+
+@st.cache_resource
+def _get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Start one event loop in a background thread for the whole server process.
+    
+    The embeddings' async HTTP client is cached per process and bound to the loop it
+    first ran on, so async work must always go to this loop rather than a new one per click.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="app-event-loop", daemon=True).start()
+    return loop
+
+def run_async(coro):
+    """Run a coroutine on the shared background event loop and wait for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_event_loop()).result()
 
 def main():
     # Initialize session state
     if "app" not in st.session_state:
         try:
+            # One app (and conversation) per browser session; the Qdrant client,
+            # embeddings and document processor underneath are shared process-wide
             st.session_state.app = get_app()
             st.session_state.messages = []
         except Exception as e:
@@ -77,21 +58,24 @@ def main():
         st.header("Upload Documents")
         
         # PDF upload
-        uploaded_file = st.file_uploader("Upload a PDF document", type="pdf")
+        uploaded_files = st.file_uploader("Upload PDF documents", type="pdf", accept_multiple_files=True)
         
-        if uploaded_file is not None:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-                temp_file.write(uploaded_file.getvalue())
-                temp_path = temp_file.name
+        if uploaded_files and st.button("Process PDF Documents"):
+            temp_paths = []
+            for uploaded_file in uploaded_files:
+                with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
+                    # Stream to disk in 1 MiB chunks rather than copying the whole PDF into memory
+                    uploaded_file.seek(0)
+                    shutil.copyfileobj(uploaded_file, temp_file, length=1024 * 1024)
+                    temp_paths.append(temp_file.name)
+            
+            with st.spinner(f"Processing {len(temp_paths)} document(s)..."):
+                success = run_async(st.session_state.app.aupload_pdfs(temp_paths))
             
-            if st.button("Process PDF Document"):
-                with st.spinner("Processing document..."):
-                    success = st.session_state.app.upload_pdf(temp_path, uploaded_file.name)
-                
-                if success:
-                    st.success(f"Successfully processed {uploaded_file.name}")
-                else:
-                    st.error("Error processing document")
+            if success:
+                st.success(f"Successfully processed {', '.join(f.name for f in uploaded_files)}")
+            else:
+                st.error("Error processing documents")
         
         # Text input for documents
         st.header("Or Add Text Directly")
@@ -100,7 +84,7 @@ def main():
         
         if st.button("Process Text as Document") and text_input:
             with st.spinner("Processing text..."):
-                success = st.session_state.app.add_text(text_input, source_name)
+                success = run_async(st.session_state.app.aadd_text(text_input, source_name))
             
             if success:
                 st.success("Text processed successfully")
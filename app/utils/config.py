@@ -1,6 +1,7 @@
 
 # app/utils/config.py
 import os
+import logging
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -13,6 +14,22 @@ OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
 
 # LangSmith Configuration
 LANGCHAIN_PROJECT = os.getenv("LANGCHAIN_PROJECT", "weather-rag-agent")
+LANGCHAIN_SAMPLE_RATE = float(os.getenv("LANGCHAIN_SAMPLE_RATE", "1.0"))
+
+# Debug output on the request path
+DEBUG = os.getenv("DEBUG", "").lower() in ("1", "true", "yes")
+
+# App loggers stay at WARNING unless DEBUG is set
+if DEBUG:
+    logging.basicConfig()
+logging.getLogger(__name__.split(".")[0]).setLevel(logging.DEBUG if DEBUG else logging.WARNING)
+
+# Worker processes used to load and split documents in parallel
+LOAD_DOCUMENTS_NUM_WORKERS = int(os.getenv("LOAD_DOCUMENTS_NUM_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+
+# Qdrant bulk upload tuning
+QDRANT_PARALLEL = int(os.getenv("QDRANT_PARALLEL", 8))
+QDRANT_BATCH_SIZE = int(os.getenv("QDRANT_BATCH_SIZE", 256))
 
 # Set up directories
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
@@ -1,35 +1,199 @@
+from __future__ import annotations
+
 import os
-from typing import List, Dict, Any, Optional
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.document_loaders import PyPDFLoader, TextLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.vectorstores import Qdrant as QdrantVectorStore  # Corrected import
-from qdrant_client import QdrantClient
-from langchain.schema import Document
-from .config import OPENAI_API_KEY, PDF_DATA_PATH, VECTOR_DB_PATH, DOCUMENTS_DIR
+import uuid
+import functools
+import itertools
+import asyncio
+import logging
+import multiprocessing
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, List, Dict, Any, Iterable, Iterator, Optional, Tuple
+from .config import PDF_DATA_PATH, VECTOR_DB_PATH, DOCUMENTS_DIR, LOAD_DOCUMENTS_NUM_WORKERS, QDRANT_PARALLEL, QDRANT_BATCH_SIZE
 # from .sample_loader import get_sample_documents
 
+logger = logging.getLogger(__name__)
+
+# langchain, qdrant-client, openai, tiktoken and PyMuPDF are imported where they are used
+# so that importing this module (and starting the UI) stays cheap
+if TYPE_CHECKING:
+    from langchain.schema import Document
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain.vectorstores import Qdrant as QdrantVectorStore
+    from langchain.embeddings import CacheBackedEmbeddings
+    from qdrant_client import QdrantClient
+
+# HNSW index settings for the Qdrant collection
+HNSW_M = 32
+HNSW_EF_CONSTRUCT = 200
+HNSW_EF_SEARCH = 64
+
+# Optimizer indexing threshold restored after a bulk upload if the collection has none set
+INDEXING_THRESHOLD = 20000
+
+# Chunk size and overlap, in tokens
+CHUNK_SIZE = 512
+CHUNK_OVERLAP = 64
+
+# Number of chunks embedded per embeddings API request
+EMBED_BATCH_SIZE = 1000
+
+# Embedding requests kept in flight at once by the async ingestion path
+EMBED_MAX_CONCURRENCY = 4
+
+# On-disk cache of document embeddings, keyed by a SHA-256 hash of the content
+EMBEDDING_CACHE_DIR = os.path.join(VECTOR_DB_PATH, "emb_cache")
+
+@functools.lru_cache(maxsize=1)
+def _get_encoding():
+    """Load the cl100k_base tokenizer used by the OpenAI embedding models."""
+    import tiktoken
+    
+    return tiktoken.get_encoding("cl100k_base")
+
+def _token_length(text: str) -> int:
+    """Length of text in embedding model tokens."""
+    return len(_get_encoding().encode(text, disallowed_special=()))
+
+def create_text_splitter() -> RecursiveCharacterTextSplitter:
+    """Create the text splitter used to chunk documents, measuring chunks in tokens."""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        length_function=_token_length,
+    )
+
+def _iter_document_files() -> Iterator[Tuple[str, str]]:
+    """
+    Yield (file path, file type) for every PDF and text document in the data directories.
+    
+    Returns:
+        Iterator of (path, type) tuples, where the type is "pdf" or "txt"
+    """
+    for directory, file_type in ((PDF_DATA_PATH, "pdf"), (DOCUMENTS_DIR, "txt")):
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(f".{file_type}") and entry.is_file():
+                    yield entry.path, file_type
+
+def _read_pdf_pages(pdf_path: str) -> List[Document]:
+    """
+    Extract the text of every page of a PDF.
+    
+    Pages are read serially: PyMuPDF is not thread-safe and holds the GIL while
+    extracting text, so separate PDFs are parallelized across processes instead.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        
+    Returns:
+        One document per page
+    """
+    import fitz  # PyMuPDF
+    from langchain.schema import Document
+    
+    with fitz.open(pdf_path) as doc:
+        page_count = doc.page_count
+        return [
+            Document(page_content=page.get_text(), metadata={"source": pdf_path, "page": i, "total_pages": page_count})
+            for i, page in enumerate(doc)
+        ]
+
+def _load_one(file_info: Tuple[str, str]) -> List[Document]:
+    """
+    Load and split a single file. Runs in a worker process.
+    
+    Args:
+        file_info: Tuple of (file path, file type), where the type is "pdf" or "txt"
+        
+    Returns:
+        List of document chunks
+    """
+    from langchain_community.document_loaders import TextLoader
+    
+    path, file_type = file_info
+    documents = _read_pdf_pages(path) if file_type == "pdf" else TextLoader(path).load()
+    return create_text_splitter().split_documents(documents)
+
+@functools.lru_cache(maxsize=1)
+def get_qdrant_client() -> QdrantClient:
+    """Open the local Qdrant storage once per process; the storage is locked while open."""
+    from qdrant_client import QdrantClient
+    
+    os.makedirs(VECTOR_DB_PATH, exist_ok=True)
+    return QdrantClient(path=VECTOR_DB_PATH)
+
+@functools.lru_cache(maxsize=1)
+def get_embeddings() -> CacheBackedEmbeddings:
+    """
+    Create the shared OpenAI embedding model, until the cache is cleared on an API key change.
+    
+    Document embeddings are cached on disk keyed by the model name and a SHA-256
+    hash of the text, so re-ingesting the same content does not call the API again.
+    
+    Returns:
+        Cache-backed OpenAI embeddings
+    """
+    from langchain.embeddings import CacheBackedEmbeddings
+    from langchain.storage import LocalFileStore
+    from langchain_openai import OpenAIEmbeddings
+    
+    embeddings = OpenAIEmbeddings(openai_api_key=os.environ.get("OPENAI_API_KEY"), chunk_size=EMBED_BATCH_SIZE)
+    return CacheBackedEmbeddings.from_bytes_store(
+        embeddings,
+        LocalFileStore(EMBEDDING_CACHE_DIR),
+        namespace=embeddings.model,
+        key_encoder="sha256"
+    )
+
+def _length_order(texts: List[str]) -> List[int]:
+    """Indices of texts sorted by length, so embedding batches hold similar-sized inputs."""
+    return sorted(range(len(texts)), key=lambda i: len(texts[i]))
+
+def _unsort(order: List[int], items: List[Any]) -> List[Any]:
+    """Put items produced in the given order back at their original positions."""
+    result = [None] * len(items)
+    for i, item in zip(order, items):
+        result[i] = item
+    return result
+
 class DocumentProcessor:
     """Process and store documents in vector database."""
     
-    def __init__(self, collection_name: str = "pdf_documents"):
+    def __init__(
+        self,
+        collection_name: str = "pdf_documents",
+        embeddings: Optional[Any] = None,
+        client: Optional[QdrantClient] = None
+    ):
         """
         Initialize the document processor.
         
         Args:
             collection_name: Name of the vector database collection
+            embeddings: Embedding model to use. Defaults to cache-backed OpenAIEmbeddings.
+            client: Qdrant client to use. Defaults to local storage at VECTOR_DB_PATH.
         """
-        self.embeddings = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY)
+        self.embeddings = embeddings or get_embeddings()
         self.collection_name = collection_name
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=100,
-            length_function=len,
-        )
+        self.text_splitter = create_text_splitter()
         
         # Initialize Qdrant client
-        os.makedirs(VECTOR_DB_PATH, exist_ok=True)
-        self.client = QdrantClient(path=VECTOR_DB_PATH)
+        self.client = client or get_qdrant_client()
+        
+        # Bumped whenever the vector store changes so cached retrievers get rebuilt
+        self.version = 0
+        self._retriever = None
+        self._retriever_version = -1
+        
+        # Overlapping bulk uploads share one pause of HNSW indexing
+        self._bulk_lock = threading.Lock()
+        self._bulk_depth = 0
+        self._saved_indexing_threshold = INDEXING_THRESHOLD
         
     def load_pdf(self, pdf_path: str) -> List:
         """
@@ -41,8 +205,7 @@ class DocumentProcessor:
         Returns:
             List of document chunks
         """
-        loader = PyPDFLoader(pdf_path)
-        documents = loader.load()
+        documents = _read_pdf_pages(pdf_path)
         chunks = self.text_splitter.split_documents(documents)
         return chunks
     
@@ -56,11 +219,56 @@ class DocumentProcessor:
         Returns:
             List of document chunks
         """
+        from langchain_community.document_loaders import TextLoader
+        
         loader = TextLoader(text_path)
         documents = loader.load()
         chunks = self.text_splitter.split_documents(documents)
         return chunks
         
+    def load_pdfs(self, pdf_paths: List[str]) -> List:
+        """
+        Load and split several PDF documents in parallel.
+        
+        Args:
+            pdf_paths: Paths to the PDF files
+            
+        Returns:
+            List of document chunks from all files
+        """
+        return self._load_files((pdf_path, "pdf") for pdf_path in pdf_paths)
+    
+    def _load_files(self, files: Iterable[Tuple[str, str]]) -> List:
+        """
+        Load and split files in parallel worker processes.
+        
+        Args:
+            files: (file path, file type) tuples, where the type is "pdf" or "txt"
+            
+        Returns:
+            List of document chunks in file order
+        """
+        all_chunks = []
+        
+        # Peek at the first two files; a single file is loaded in process, since
+        # starting worker processes costs more than it saves
+        files = iter(files)
+        head = list(itertools.islice(files, 2))
+        files = itertools.chain(head, files)
+        
+        if LOAD_DOCUMENTS_NUM_WORKERS > 1 and len(head) > 1:
+            # Forking a process that runs threads (Streamlit, Qdrant, the event loop) can deadlock
+            with ProcessPoolExecutor(
+                max_workers=LOAD_DOCUMENTS_NUM_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            ) as pool:
+                for chunks in pool.map(_load_one, files):
+                    all_chunks.extend(chunks)
+        else:
+            for file_info in files:
+                all_chunks.extend(_load_one(file_info))
+        return all_chunks
+        
     def load_all_documents(self) -> List:
         """
         Load all documents from the data directories.
@@ -74,19 +282,8 @@ class DocumentProcessor:
         os.makedirs(PDF_DATA_PATH, exist_ok=True)
         os.makedirs(DOCUMENTS_DIR, exist_ok=True)
         
-        # Load PDFs
-        for filename in os.listdir(PDF_DATA_PATH):
-            if filename.endswith('.pdf'):
-                pdf_path = os.path.join(PDF_DATA_PATH, filename)
-                chunks = self.load_pdf(pdf_path)
-                all_chunks.extend(chunks)
-        
-        # Load text documents
-        for filename in os.listdir(DOCUMENTS_DIR):
-            if filename.endswith('.txt'):
-                text_path = os.path.join(DOCUMENTS_DIR, filename)
-                chunks = self.load_text_document(text_path)
-                all_chunks.extend(chunks)
+        # PDFs and text documents, streamed to the loaders as they are found
+        all_chunks.extend(self._load_files(_iter_document_files()))
         
         # # If no documents found, use sample documents
         # if not all_chunks:
@@ -108,24 +305,125 @@ class DocumentProcessor:
         Returns:
             QdrantVectorStore instance
         """
+        return self.store_documents(self._split_text(text, metadata), bulk=False)
+    
+    async def aprocess_text(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> QdrantVectorStore:
+        """
+        Process text and add it to the vector store, embedding batches concurrently.
+        
+        Args:
+            text: Text content to process
+            metadata: Metadata for the document
+            
+        Returns:
+            QdrantVectorStore instance
+        """
+        return await self.astore_documents(self._split_text(text, metadata), bulk=False)
+    
+    def _split_text(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> List[Document]:
+        """Split text entered by the user into document chunks."""
+        from langchain.schema import Document
+        
         if metadata is None:
             metadata = {"source": "user_input"}
         
-        # Split the text into chunks
         doc = Document(page_content=text, metadata=metadata)
-        chunks = self.text_splitter.split_documents([doc])
+        return self.text_splitter.split_documents([doc])
+    
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts with as few embeddings API requests as possible.
+        Texts are batched shortest first so each request holds similar lengths.
         
-        try:
-            # Try to get existing vector store
-            vector_store = self.get_vector_store()
+        Args:
+            texts: Texts to embed
             
-            # Add documents to the existing store
-            vector_store.add_documents(chunks)
-            return vector_store
+        Returns:
+            One embedding vector per text
+        """
+        order = _length_order(texts)
+        sorted_texts = [texts[i] for i in order]
+        vectors = []
+        for start in range(0, len(sorted_texts), EMBED_BATCH_SIZE):
+            vectors.extend(self.embeddings.embed_documents(sorted_texts[start:start + EMBED_BATCH_SIZE]))
+        return _unsort(order, vectors)
+    
+    async def _aembed_texts(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts with up to EMBED_MAX_CONCURRENCY batch requests in flight at once.
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            One embedding vector per text
+        """
+        order = _length_order(texts)
+        sorted_texts = [texts[i] for i in order]
+        semaphore = asyncio.Semaphore(EMBED_MAX_CONCURRENCY)
+        
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await self.embeddings.aembed_documents(batch)
+        
+        batches = await asyncio.gather(*[
+            embed_batch(sorted_texts[start:start + EMBED_BATCH_SIZE])
+            for start in range(0, len(sorted_texts), EMBED_BATCH_SIZE)
+        ])
+        return _unsort(order, [vector for batch in batches for vector in batch])
+    
+    def _add_chunks(self, chunks: List[Document]):
+        """
+        Embed document chunks in large batches and upsert them into the collection.
+        
+        Args:
+            chunks: List of document chunks
+        """
+        texts = [chunk.page_content for chunk in chunks]
+        self._upload_chunks(chunks, self._embed_texts(texts))
+    
+    async def _aadd_chunks(self, chunks: List[Document]):
+        """
+        Embed document chunks concurrently and upsert them into the collection.
+        
+        Args:
+            chunks: List of document chunks
+        """
+        texts = [chunk.page_content for chunk in chunks]
+        vectors = await self._aembed_texts(texts)
+        await asyncio.to_thread(self._upload_chunks, chunks, vectors)
+    
+    def _upload_chunks(self, chunks: List[Document], vectors: List[List[float]]):
+        """
+        Upload embedded document chunks into the collection in parallel batches.
+        
+        Args:
+            chunks: List of document chunks
+            vectors: One embedding vector per chunk
+        """
+        from qdrant_client.http import models
+        
+        # Payload layout matches what the LangChain Qdrant store reads back
+        ids = [uuid.uuid4().hex for _ in chunks]
+        payloads = [{"page_content": chunk.page_content, "metadata": chunk.metadata} for chunk in chunks]
+        
+        try:
+            self.client.upload_collection(
+                collection_name=self.collection_name,
+                vectors=vectors,
+                payload=payloads,
+                ids=ids,
+                parallel=QDRANT_PARALLEL,
+                batch_size=QDRANT_BATCH_SIZE
+            )
         except Exception as e:
-            print(f"Error adding to existing store: {e}")
-            # If failed, create a new vector store
-            return self._create_vector_store_from_docs(chunks)
+            logger.warning(f"Error uploading collection, falling back to upsert: {e}")
+            points = [
+                models.PointStruct(id=point_id, vector=vector, payload=payload)
+                for point_id, vector, payload in zip(ids, vectors, payloads)
+            ]
+            self.client.upsert(collection_name=self.collection_name, points=points)
+        self.version += 1
     
     def _create_vector_store_from_docs(self, chunks: List[Document]) -> QdrantVectorStore:
         """
@@ -137,27 +435,35 @@ class DocumentProcessor:
         Returns:
             QdrantVectorStore instance
         """
+        from langchain.schema import Document
+        from langchain.vectorstores import Qdrant as QdrantVectorStore
+        from qdrant_client.http import models
+        
         # If chunks is empty, create a dummy document to initialize
         if not chunks:
             chunks = [Document(page_content="Initial document", metadata={"source": "init"})]
             
-        # Create the vector store
+        # Create the vector store; length-sorted so embedding batches hold similar-sized chunks
         vector_store = QdrantVectorStore.from_documents(
-            chunks,
+            sorted(chunks, key=lambda chunk: len(chunk.page_content)),
             self.embeddings,
             url=None,  # Local storage
             client=self.client,
-            collection_name=self.collection_name
+            collection_name=self.collection_name,
+            batch_size=EMBED_BATCH_SIZE,
+            hnsw_config=models.HnswConfigDiff(m=HNSW_M, ef_construct=HNSW_EF_CONSTRUCT)
         )
+        self.version += 1
         
         return vector_store
     
-    def store_documents(self, chunks: List = None) -> QdrantVectorStore:
+    def store_documents(self, chunks: List = None, bulk: bool = True) -> QdrantVectorStore:
         """
         Store document chunks in vector database.
         
         Args:
             chunks: List of document chunks. If None, all documents will be loaded.
+            bulk: Pause HNSW indexing while the chunks are uploaded
             
         Returns:
             QdrantVectorStore instance
@@ -171,14 +477,142 @@ class DocumentProcessor:
             
             # Add new documents to existing store
             if chunks:
-                vector_store.add_documents(chunks)
+                with self._bulk_indexing(bulk):
+                    self._add_chunks(chunks)
             
             return vector_store
         except Exception as e:
-            print(f"Creating new vector store: {e}")
+            logger.warning(f"Creating new vector store: {e}")
             # Create new vector store
             return self._create_vector_store_from_docs(chunks)
     
+    async def astore_documents(self, chunks: List = None, bulk: bool = True) -> QdrantVectorStore:
+        """
+        Store document chunks in vector database, embedding batches concurrently.
+        
+        Args:
+            chunks: List of document chunks. If None, all documents will be loaded.
+            bulk: Pause HNSW indexing while the chunks are uploaded
+            
+        Returns:
+            QdrantVectorStore instance
+        """
+        if chunks is None:
+            chunks = await asyncio.to_thread(self.load_all_documents)
+        
+        try:
+            # Try to get existing vector store first
+            vector_store = await asyncio.to_thread(self.get_vector_store)
+            
+            # Add new documents to existing store
+            if chunks:
+                async with self._abulk_indexing(bulk):
+                    await self._aadd_chunks(chunks)
+            
+            return vector_store
+        except Exception as e:
+            logger.warning(f"Creating new vector store: {e}")
+            # Create new vector store
+            return await asyncio.to_thread(self._create_vector_store_from_docs, chunks)
+    
+    def upload_pdfs(self, pdf_paths: List[str]) -> QdrantVectorStore:
+        """
+        Load several PDF documents and store all of their chunks in one bulk upload.
+        
+        Args:
+            pdf_paths: Paths to the PDF files
+            
+        Returns:
+            QdrantVectorStore instance
+        """
+        return self.store_documents(self.load_pdfs(pdf_paths))
+    
+    async def aupload_pdfs(self, pdf_paths: List[str]) -> QdrantVectorStore:
+        """
+        Load several PDF documents and store all of their chunks in one bulk upload,
+        embedding batches concurrently.
+        
+        Args:
+            pdf_paths: Paths to the PDF files
+            
+        Returns:
+            QdrantVectorStore instance
+        """
+        chunks = await asyncio.to_thread(self.load_pdfs, pdf_paths)
+        return await self.astore_documents(chunks)
+    
+    def _set_indexing_threshold(self, threshold: int):
+        """Set the optimizer indexing threshold of the collection."""
+        from qdrant_client.http import models
+        
+        self.client.update_collection(
+            collection_name=self.collection_name,
+            optimizer_config=models.OptimizersConfigDiff(indexing_threshold=threshold)
+        )
+    
+    def _get_indexing_threshold(self) -> int:
+        """Get the optimizer indexing threshold of the collection."""
+        config = self.client.get_collection(self.collection_name).config.optimizer_config
+        
+        # 0 is only left behind by an interrupted bulk upload
+        return config.indexing_threshold or INDEXING_THRESHOLD
+    
+    def _pause_indexing(self):
+        """Disable HNSW indexing before the first of overlapping bulk uploads, saving the threshold."""
+        with self._bulk_lock:
+            if self._bulk_depth == 0:
+                self._saved_indexing_threshold = self._get_indexing_threshold()
+                self._set_indexing_threshold(0)
+            self._bulk_depth += 1
+    
+    def _resume_indexing(self):
+        """Restore the saved indexing threshold once the last overlapping bulk upload is done."""
+        with self._bulk_lock:
+            self._bulk_depth -= 1
+            if self._bulk_depth == 0:
+                self._set_indexing_threshold(self._saved_indexing_threshold)
+    
+    @contextmanager
+    def _bulk_indexing(self, enabled: bool = True):
+        """
+        Disable HNSW indexing for the duration of a bulk upload and re-enable it afterwards.
+        
+        Args:
+            enabled: Whether to toggle indexing at all
+        """
+        if not enabled:
+            yield
+            return
+        
+        self._pause_indexing()
+        try:
+            yield
+        finally:
+            self._resume_indexing()
+    
+    @asynccontextmanager
+    async def _abulk_indexing(self, enabled: bool = True):
+        """
+        Async variant of _bulk_indexing that updates the collection off the event loop.
+        
+        Args:
+            enabled: Whether to toggle indexing at all
+        """
+        if not enabled:
+            yield
+            return
+        
+        await asyncio.to_thread(self._pause_indexing)
+        try:
+            yield
+        finally:
+            await asyncio.to_thread(self._resume_indexing)
+    
+    def set_embeddings(self, embeddings: Any):
+        """Switch the embedding model, rebuilding the cached retriever on next use."""
+        self.embeddings = embeddings
+        self.version += 1
+    
     def get_vector_store(self) -> QdrantVectorStore:
         """
         Get the existing vector store or create a new one if it doesn't exist.
@@ -186,6 +620,8 @@ class DocumentProcessor:
         Returns:
             QdrantVectorStore instance
         """
+        from langchain.vectorstores import Qdrant as QdrantVectorStore
+        
         try:
             # Check if collection exists
             collections = self.client.get_collections()
@@ -203,6 +639,28 @@ class DocumentProcessor:
             
             return vector_store
         except Exception as e:
-            print(f"Error getting vector store: {e}")
+            logger.warning(f"Error getting vector store: {e}")
             # Create a new vector store with an initial document
-            return self._create_vector_store_from_docs([])
\ No newline at end of file
+            return self._create_vector_store_from_docs([])
+    
+    def get_retriever(self):
+        """
+        Get a retriever over the vector store, rebuilding it only when the store has changed.
+        
+        Returns:
+            Vector store retriever
+        """
+        from qdrant_client.http import models
+        
+        if self._retriever is None or self._retriever_version != self.version:
+            vector_store = self.get_vector_store()
+            self._retriever = vector_store.as_retriever(
+                search_type="similarity",
+                search_kwargs={
+                    "k": 3,
+                    "search_params": models.SearchParams(hnsw_ef=HNSW_EF_SEARCH)
+                }
+            )
+            self._retriever_version = self.version
+        
+        return self._retriever
\ No newline at end of file
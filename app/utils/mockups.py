@@ -2,6 +2,7 @@
 """Mockup implementations for testing without API dependencies."""
 
 from typing import Dict, Any
+import numpy as np
 from langchain.schema import Document
 from langchain.retrievers import BaseRetriever
 from langchain_core.runnables import RunnablePassthrough
@@ -12,13 +13,11 @@ class MockEmbeddings:
     
     def embed_documents(self, texts):
         """Return random embeddings for documents."""
-        import random
-        return [[random.random() for _ in range(10)] for _ in texts]
+        return np.random.random((len(texts), 10)).tolist()
     
     def embed_query(self, text):
         """Return random embedding for query."""
-        import random
-        return [random.random() for _ in range(10)]
+        return np.random.random(10).tolist()
 
 class MockRetriever(BaseRetriever):
     """Mock retriever that returns predefined documents."""
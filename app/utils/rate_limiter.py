@@ -0,0 +1,32 @@
+# app/utils/rate_limiter.py
+import asyncio
+import time
+from typing import Optional
+
+class AsyncRateLimiter:
+    """Spaces out async calls so they stay under a requests-per-minute limit."""
+    
+    def __init__(self, rate_limit: Optional[int] = None):
+        """
+        Initialize the rate limiter.
+        
+        Args:
+            rate_limit: Maximum requests per minute. None disables limiting.
+        """
+        self.rate_limit = rate_limit
+        self.interval = 60.0 / rate_limit if rate_limit else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self):
+        """Wait until the next request slot is available."""
+        if not self.interval:
+            return
+        
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        
+        if wait > 0:
+            await asyncio.sleep(wait)
@@ -1,17 +1,72 @@
 # app/utils/weather_api.py
+import threading
+import time
 import requests
-from typing import Dict, Any, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, Any, Optional, Tuple
+
+# In-process TTL cache of raw weather responses
+WEATHER_CACHE_TTL = 600  # OpenWeather refreshes roughly every 10 minutes
+WEATHER_CACHE_MAX_ENTRIES = 256
+_WEATHER_CACHE: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+_WEATHER_CACHE_LOCK = threading.Lock()
+
+def _get_cached_weather(key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+    """Return a cached weather response if it has not expired."""
+    with _WEATHER_CACHE_LOCK:
+        entry = _WEATHER_CACHE.get(key)
+        if entry is None:
+            return None
+        
+        timestamp, data = entry
+        if time.monotonic() - timestamp > WEATHER_CACHE_TTL:
+            del _WEATHER_CACHE[key]
+            return None
+        
+        return data
+
+def _cache_weather(key: Tuple[str, str], data: Dict[str, Any]):
+    """Store a weather response, evicting expired or oldest entries when full."""
+    with _WEATHER_CACHE_LOCK:
+        now = time.monotonic()
+        if len(_WEATHER_CACHE) >= WEATHER_CACHE_MAX_ENTRIES:
+            for cached_key, (timestamp, _) in list(_WEATHER_CACHE.items()):
+                if now - timestamp > WEATHER_CACHE_TTL:
+                    del _WEATHER_CACHE[cached_key]
+        
+        while len(_WEATHER_CACHE) >= WEATHER_CACHE_MAX_ENTRIES:
+            del _WEATHER_CACHE[next(iter(_WEATHER_CACHE))]
+        
+        _WEATHER_CACHE[key] = (now, data)
+
+def clear_weather_cache():
+    """Clear the in-process weather cache."""
+    with _WEATHER_CACHE_LOCK:
+        _WEATHER_CACHE.clear()
 
 class WeatherAPI:
     """Utility class for fetching weather data from OpenWeatherMap API."""
     
     BASE_URL = "https://api.openweathermap.org/data/2.5/weather"
+    REQUEST_TIMEOUT = (3.05, 10)  # (connect, read) seconds
     
-    @staticmethod
-    def get_weather_by_city(city: str, api_key: str, units: str = "metric") -> Dict[str, Any]:
+    # Shared session so repeated calls reuse the keep-alive connection
+    _session = requests.Session()
+    _session.mount("https://", HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=10,
+        max_retries=Retry(total=3, backoff_factor=0.3)
+    ))
+    
+    @classmethod
+    def get_weather_by_city(cls, city: str, api_key: str, units: str = "metric") -> Dict[str, Any]:
         """
         Fetch current weather data for a specific city.
         
+        Responses are cached in process for WEATHER_CACHE_TTL seconds, keyed
+        case-insensitively on the city name.
+        
         Args:
             city: The name of the city
             api_key: OpenWeatherMap API key
@@ -20,16 +75,23 @@ class WeatherAPI:
         Returns:
             Dictionary containing weather data
         """
+        cache_key = (city.strip().lower(), units)
+        cached = _get_cached_weather(cache_key)
+        if cached is not None:
+            return cached
+        
         params = {
             "q": city,
             "appid": api_key,
             "units": units
         }
         
-        response = requests.get(WeatherAPI.BASE_URL, params=params)
+        response = cls._session.get(cls.BASE_URL, params=params, timeout=cls.REQUEST_TIMEOUT)
         response.raise_for_status()  # Raise exception for HTTP errors
         
-        return response.json()
+        data = response.json()
+        _cache_weather(cache_key, data)
+        return data
     
     @staticmethod
     def format_weather_data(weather_data: Dict[str, Any]) -> str:
@@ -5,6 +5,7 @@ This script handles path setup and environment configuration.
 """
 
 import os
+import subprocess
 import sys
 import traceback
 from pathlib import Path
@@ -43,9 +44,8 @@ def main():
         print(f"Error: Could not find Streamlit app at {app_path}")
         sys.exit(1)
     
-    # Run the Streamlit app using os.system to avoid path issues
-    cmd = f"{sys.executable} -m streamlit run {app_path}"
-    return os.system(cmd)
+    # Run the Streamlit app directly, without an intermediate shell
+    return subprocess.call([sys.executable, "-m", "streamlit", "run", app_path])
 
 if __name__ == "__main__":
     try:
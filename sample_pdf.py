@@ -14,9 +14,10 @@ def create_sample_pdf(output_path):
     c.setFont("Helvetica-Bold", 16)
     c.drawString(72, 750, "Climate Change Information Document")
     
-    # Add content
-    c.setFont("Helvetica", 12)
-    y_position = 720
+    # Add content as a single text object
+    text_object = c.beginText(72, 720)
+    text_object.setFont("Helvetica", 12)
+    text_object.setLeading(15)
     
     paragraphs = [
         "Climate change refers to long-term shifts in temperatures and weather patterns. These shifts may be natural, such as through variations in the solar cycle. But since the 1800s, human activities have been the main driver of climate change, primarily due to burning fossil fuels like coal, oil and gas, which produces heat-trapping gases.",
@@ -47,14 +48,8 @@ def create_sample_pdf(output_path):
     ]
     
     for paragraph in paragraphs:
-        if paragraph == "":
-            y_position -= 15  # Add extra space for empty lines
-        else:
-            text_object = c.beginText(72, y_position)
-            text_object.setFont("Helvetica", 12)
-            text_object.textLine(paragraph)
-            c.drawText(text_object)
-            y_position -= 15
+        text_object.textLine(paragraph)  # Empty lines just advance the leading
+    c.drawText(text_object)
     
     # Save the PDF
     c.save()
@@ -8,6 +8,7 @@ import subprocess
 import sys
 import os
 import argparse
+import importlib.util
 from pathlib import Path
 
 def create_env_file():
@@ -25,6 +26,8 @@ OPENWEATHER_API_KEY=
 LANGCHAIN_API_KEY=
 LANGCHAIN_PROJECT=paper-weather
 LANGCHAIN_ENDPOINT=https://api.smith.langchain.com
+# Fraction of queries to trace (1.0 = all, 0.05 = 5%)
+LANGCHAIN_SAMPLE_RATE=1.0
 
 # If OpenAI API has quota issues, set this to use mockups
 # OPENAI_ERROR=insufficient_quota
@@ -48,13 +51,11 @@ def check_dependencies():
         "openai"
     ]
     
-    # Check if packages are installed
-    missing = []
-    for package in required_packages:
-        try:
-            __import__(package.replace("-", "_"))
-        except ImportError:
-            missing.append(package)
+    # Check if packages are installed without importing them
+    missing = [
+        package for package in required_packages
+        if importlib.util.find_spec(package.replace("-", "_")) is None
+    ]
     
     return missing
 